@@ -0,0 +1,17 @@
+-- Timing comparison of the latest-row-per-video selections on the full dataset.
+-- `dbt compile --select latest_video_snapshot_timing`, then run the compiled file with `.timer on` in the DuckDB CLI.
+
+-- Former correlated subquery
+SELECT count(*)
+FROM {{ ref("video_statistic_staging") }} vs
+WHERE vs.date >= ALL(SELECT vs1.date
+                     FROM {{ ref("video_statistic_staging") }} vs1
+                     WHERE vs.video_id = vs1.video_id);
+
+-- Window function, as in filtered_video_daily_rollup
+SELECT count(*)
+FROM (
+    SELECT vs.*
+    FROM {{ ref("video_statistic_staging") }} vs
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY vs.video_id ORDER BY vs.date DESC) = 1
+);
@@ -0,0 +1,30 @@
+{% macro run_loaded_at() %}
+    {#- Timestamp of the current dbt run, stamped on the rows it loads -#}
+    '{{ run_started_at.strftime("%Y-%m-%d %H:%M:%S.%f") }}'::TIMESTAMP
+{%- endmacro %}
+
+
+{% macro export_partitions(relation, location, partition_by, order_by=none, row_group_size=none) %}
+    {#-
+        Exports the rows loaded by the current run as Hive-partitioned Parquet.
+        A full refresh rewrites the dataset, an incremental run adds files to the
+        partitions it touches and leaves the others as they are.
+        Rows are written in `order_by` order, so the row group statistics of the
+        sorted columns let readers skip row groups.
+    -#}
+    COPY (
+        SELECT * EXCLUDE (loaded_at)
+        FROM {{ relation }}
+        WHERE loaded_at = {{ run_loaded_at() }}
+        {% if order_by %}
+        ORDER BY {{ order_by }}
+        {% endif %}
+    ) TO '{{ location }}' (
+        FORMAT PARQUET,
+        PARTITION_BY ({{ partition_by }}),
+        {% if row_group_size %}
+        ROW_GROUP_SIZE {{ row_group_size }},
+        {% endif %}
+        {{ 'APPEND' if is_incremental() else 'OVERWRITE' }}
+    )
+{% endmacro %}
@@ -1,12 +1,20 @@
+{{
+    config(materialized='incremental')
+}}
+
 WITH filtered_interaction AS (
-    SELECT user_id,
-    FROM {{ ref('user_interaction_staging') }}
-    GROUP BY user_id
-    HAVING COUNT(*) >= 5
+    SELECT user_id
+    FROM {{ ref('user_interaction_count') }}
+    WHERE interaction_cnt >= 5
 )
 
 SELECT ui.*
 FROM {{ ref('user_interaction_staging') }} as ui
 JOIN filtered_interaction as fi
     ON ui.user_id = fi.user_id
-ORDER BY ui.user_id, ui.date
\ No newline at end of file
+{% if is_incremental() %}
+-- New days, plus the whole history of the users who just reached 5 interactions
+WHERE ui.date > (SELECT MAX(date) FROM {{ this }})
+    OR ui.user_id NOT IN (SELECT DISTINCT user_id FROM {{ this }})
+{% endif %}
+ORDER BY ui.user_id, ui.date
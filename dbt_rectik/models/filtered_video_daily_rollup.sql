@@ -0,0 +1,5 @@
+-- Latest rollup row per video, in a single scan of the staging view.
+-- (video_id, date) is the primary key, so there are no ties on the latest date.
+SELECT vr.*
+FROM {{ ref("video_daily_rollup_staging") }} as vr
+QUALIFY ROW_NUMBER() OVER (PARTITION BY vr.video_id ORDER BY vr.date DESC) = 1
@@ -1,16 +1,25 @@
-{{ 
-    config(materialized='external', 
-           location='../data/user_item.parquet')
+{{
+    config(materialized='incremental',
+           post_hook="{{ export_partitions(this, '../data/user_item', 'interaction_day',
+                                           order_by='user_id, date',
+                                           row_group_size=var('user_item_row_group_size')) }}")
 }}
 
 SELECT 
     fi.*,
     vs.video_duration,
-    fi.play_duration / vs.video_duration AS play_ratio
+    fi.play_duration / vs.video_duration AS play_ratio,
+    CAST(fi.date AS DATE) AS interaction_day,
+    {{ run_loaded_at() }} AS loaded_at
 FROM 
     {{ ref("filtered_user_interaction") }} as fi
 
 JOIN 
     {{ ref("video_staging") }} as vs
 ON 
-    vs.video_id = fi.video_id
\ No newline at end of file
+    vs.video_id = fi.video_id
+{% if is_incremental() %}
+-- Same rows as filtered_user_interaction added in this run
+WHERE fi.date > (SELECT MAX(date) FROM {{ this }})
+    OR fi.user_id NOT IN (SELECT DISTINCT user_id FROM {{ this }})
+{% endif %}
@@ -3,11 +3,11 @@
            location='../data/video.parquet')
 }}
 
+-- The daily interaction and statistic columns come pre-joined from video_daily_rollup
 SELECT 
     vs.*,
-    vc.*,
-    fi.*,
-    fs.*
+    vc.* EXCLUDE (video_id),
+    vr.* EXCLUDE (video_id)
 FROM 
     {{ ref("video_staging") }} as vs
 
@@ -17,11 +17,6 @@ ON
     vs.video_id = vc.video_id
 
 JOIN 
-    {{ ref("filtered_video_interaction") }} as fi
+    {{ ref("filtered_video_daily_rollup") }} as vr
 ON 
-    vs.video_id = fi.video_id
-
-JOIN 
-    {{ ref("filtered_video_statistic") }} as fs
-ON 
-    vs.video_id = fs.video_id
+    vs.video_id = vr.video_id
@@ -0,0 +1,43 @@
+WITH source_data AS (
+    SELECT *
+    FROM {{ source('postgres_database', 'video_daily_rollup') }}
+)
+
+SELECT
+    video_id,
+    date,
+    -- video_interaction_staging columns
+    like_cnt,
+    click_like_cnt,
+    double_click_cnt,
+    cancel_like_cnt,
+    comment_cnt,
+    direct_comment_cnt,
+    reply_comment_cnt,
+    delete_comment_cnt,
+    comment_like_cnt,
+    follow_cnt,
+    cancel_follow_cnt,
+    share_cnt,
+    download_cnt,
+    report_cnt,
+    reduce_similar_cnt,
+    collect_cnt,
+    cancel_collect_cnt,
+    -- video_statistic_staging columns
+    show_cnt,
+    show_user_num,
+    play_cnt,
+    play_user_num,
+    play_duration,
+    complete_play_cnt,
+    complete_play_user_num,
+    valid_play_cnt,
+    valid_play_user_num,
+    long_time_play_cnt,
+    long_time_play_user_num,
+    short_time_play_cnt,
+    short_time_play_user_num,
+    play_progress,
+    comment_stay_duration
+FROM source_data
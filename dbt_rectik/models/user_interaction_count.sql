@@ -0,0 +1,31 @@
+{{
+    config(materialized='incremental',
+           unique_key='user_id')
+}}
+
+-- Interaction count per user. Incremental runs only count the new days and add them to the stored counts.
+WITH new_interaction AS (
+    SELECT
+        user_id,
+        COUNT(*) AS interaction_cnt,
+        MAX(date) AS last_date
+    FROM {{ ref('user_interaction_staging') }}
+    {% if is_incremental() %}
+    WHERE date > (SELECT MAX(last_date) FROM {{ this }})
+    {% endif %}
+    GROUP BY user_id
+)
+
+SELECT
+    ni.user_id,
+    {% if is_incremental() %}
+    ni.interaction_cnt + COALESCE(uc.interaction_cnt, 0) AS interaction_cnt,
+    {% else %}
+    ni.interaction_cnt,
+    {% endif %}
+    ni.last_date
+FROM new_interaction as ni
+{% if is_incremental() %}
+LEFT JOIN {{ this }} as uc
+    ON ni.user_id = uc.user_id
+{% endif %}
@@ -0,0 +1,28 @@
+{% test latest_row_per_video(model, source_model) %}
+
+-- Rows that differ between the model and the correlated `>= ALL` selection it replaced
+WITH expected AS (
+    SELECT s.*
+    FROM {{ source_model }} as s
+    WHERE s.date >= ALL(SELECT s1.date
+                        FROM {{ source_model }} as s1
+                        WHERE s.video_id = s1.video_id)
+),
+
+missing AS (
+    SELECT * FROM expected
+    EXCEPT ALL
+    SELECT * FROM {{ model }}
+),
+
+unexpected AS (
+    SELECT * FROM {{ model }}
+    EXCEPT ALL
+    SELECT * FROM expected
+)
+
+SELECT 'missing' AS diff, * FROM missing
+UNION ALL
+SELECT 'unexpected' AS diff, * FROM unexpected
+
+{% endtest %}
@@ -0,0 +1,68 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from process.item_daily_features import latest_per_video
+
+
+def idxmax_latest(df):
+    """Latest row per video with groupby/idxmax"""
+    return df.loc[df.groupby(["video_id"])["date"].idxmax()].reset_index(drop=True)
+
+
+def sort_latest(df):
+    """Latest row per video with a stable sort of the keys + drop_duplicates"""
+    keys = pd.DataFrame({"video_id": df["video_id"].to_numpy(), "date": df["date"].to_numpy()})
+    keys = keys.sort_values(["video_id", "date"], ascending=[True, False], kind="mergesort")
+    keys = keys.drop_duplicates("video_id", keep="first")
+    return df.take(keys.index).reset_index(drop=True)
+
+
+def synthetic_daily_features(n_videos=10_000, n_days=60, seed=0):
+    """Shuffled daily rows shaped like item_daily_features.csv"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2020-07-05", periods=n_days).strftime("%Y%m%d").astype(int)
+    df = pd.DataFrame({
+        "video_id": np.repeat(np.arange(n_videos), n_days),
+        "date": np.tile(dates, n_videos),
+    })
+    for i in range(40):
+        df[f"feat{i}"] = rng.integers(0, 1000, len(df))
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def timeit(fn, df, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    if len(sys.argv) > 1:
+        csv_path = sys.argv[1]
+        print(f"Loading {csv_path}")
+        df = pd.read_csv(csv_path, encoding='utf-8-sig', lineterminator='\n').dropna()
+    else:
+        print("Using synthetic daily features")
+        df = synthetic_daily_features()
+    print(f"{len(df)} rows, {df['video_id'].nunique()} videos")
+
+    expected = None
+    for name, fn in [("groupby/idxmax", idxmax_latest), ("sort/drop_duplicates", sort_latest)]:
+        elapsed, result = timeit(fn, df)
+        if expected is None:
+            expected = result
+        pd.testing.assert_frame_equal(expected, result)
+        print(f"{name:<24} {elapsed:.3f}s")
+
+    elapsed, _ = timeit(lambda df: latest_per_video(df, n_days=7), df)
+    print(f"{'7 day window':<24} {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Checks download_ranged and extract_csv_members against a local stand-in for the dataset server:
+
+- a synthetic KuaiRec-like archive is served over HTTP with range support,
+- the first download is interrupted after some ranges, the second one resumes with the
+  missing ranges only and verifies the checksum,
+- the CSV members are extracted, and an archive with a `../` member is refused.
+
+    python check_download.py
+"""
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from utils.download_data import download_ranged, extract_csv_members
+
+RANGE_SIZE = 64 * 1024
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Static file handler answering `Range: bytes=a-b` requests, optionally failing after `fail_after` of them."""
+    fail_after = None
+    served = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def end_headers(self):
+        self.send_header("Accept-Ranges", "bytes")
+        super().end_headers()
+
+    def do_GET(self):
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if match is None:
+            return super().do_GET()
+
+        with self.lock:
+            type(self).served += 1
+            failing = self.fail_after is not None and self.served > self.fail_after
+        if failing:
+            self.send_error(503, "Interrupted")
+            return
+
+        path = self.translate_path(self.path)
+        start, end = int(match[1]), int(match[2])
+        with open(path, "rb") as f:
+            f.seek(start)
+            body = f.read(end - start + 1)
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end}/{os.path.getsize(path)}")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def synthetic_archive(path, rows=50_000, seed=0):
+    """A zip with CSV members in a subdirectory and a non-CSV member, like KuaiRec.zip"""
+    rng = np.random.default_rng(seed)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zip_ref:
+        for name in ["small_matrix.csv", "item_daily_features.csv"]:
+            buf = io.StringIO()
+            np.savetxt(buf, rng.integers(0, 1_000_000, (rows, 4)), fmt="%d", delimiter=",",
+                       header="user_id,video_id,play_duration,date", comments="")
+            zip_ref.writestr(f"KuaiRec 2.0/data/{name}", buf.getvalue())
+        zip_ref.writestr("KuaiRec 2.0/README.md", "not a csv")
+
+
+def sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        served_dir = os.path.join(root, "served")
+        data_dir = os.path.join(root, "data")
+        os.makedirs(served_dir)
+        archive = os.path.join(served_dir, "KuaiRec.zip")
+        synthetic_archive(archive)
+        digest = sha256(archive)
+        n_ranges = -(-os.path.getsize(archive) // RANGE_SIZE)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(RangeHandler, directory=served_dir))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/KuaiRec.zip"
+        destination = os.path.join(data_dir, "KuaiRec.zip")
+
+        try:
+            # Interrupted download: the server stops answering after half of the ranges
+            RangeHandler.fail_after = n_ranges // 2
+            try:
+                download_ranged(url, destination, workers=1, range_size=RANGE_SIZE, sha256=digest)
+                raise AssertionError("The interrupted download should have failed")
+            except Exception as e:
+                print(f"Interrupted download failed as expected: {e}")
+            with open(destination + ".part.ranges") as f:
+                fetched = len(f.readlines())
+            assert fetched == n_ranges // 2, fetched
+
+            # Resume: only the missing ranges are requested
+            RangeHandler.fail_after, RangeHandler.served = None, 0
+            download_ranged(url, destination, workers=4, range_size=RANGE_SIZE, sha256=digest)
+            assert RangeHandler.served == n_ranges - fetched, RangeHandler.served
+            assert sha256(destination) == digest
+            assert not os.path.exists(destination + ".part")
+            print(f"Resumed download fetched {RangeHandler.served} of {n_ranges} ranges, checksum verified")
+        finally:
+            server.shutdown()
+
+        extract_csv_members(destination, data_dir)
+        extracted = sorted(os.listdir(os.path.join(data_dir, "KuaiRec 2.0", "data")))
+        assert extracted == ["item_daily_features.csv", "small_matrix.csv"], extracted
+        print(f"Extracted {extracted}")
+
+        # A member escaping the destination directory is refused
+        evil = os.path.join(root, "evil.zip")
+        with zipfile.ZipFile(evil, "w") as zip_ref:
+            zip_ref.writestr("../escaped.csv", "a,b\n1,2\n")
+        try:
+            extract_csv_members(evil, data_dir)
+            raise AssertionError("The ../ member should have been refused")
+        except ValueError as e:
+            print(f"Refused as expected: {e}")
+        assert not os.path.exists(os.path.join(root, "escaped.csv"))
+        print("Download checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,9 @@ import os
 import logging
 from process.base import BaseCSVProcess
 from process.item_daily_features import ItemDailyFeaturesProcessor
-from utils import TABLE_MAPPING
+from process.landing import ParquetLanding
+from utils import TABLE_MAPPING, list_csv_sources, source_name
+from utils.schema import pandas_dtypes
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -16,49 +18,117 @@ class DataIngestionFlow(FlowSpec):
     )
     data_dir = Parameter(
         "data_dir",
-        help="Directory path containing CSV files",
+        help="Directory path containing CSV files. CSV members of zip archives in it are read without extracting them",
         default=os.getenv("DATA_DIR", "/app/data")
     )
+    chunksize = Parameter(
+        "chunksize",
+        help="Rows per chunk when streaming CSV files. If 0, each file is loaded at once",
+        default=int(os.getenv("CHUNKSIZE", "0"))
+    )
+    loader = Parameter(
+        "loader",
+        help="How rows are written to PostgreSQL: 'copy' (COPY FROM STDIN, keeps the migrated tables), "
+             "'upsert' (incremental, only rows newer than the table's watermark, INSERT ... ON CONFLICT) "
+             "or 'to_sql' (INSERT, replaces the table, not for partitioned tables)",
+        default=os.getenv("LOADER", "copy")
+    )
+
+    parquet_dir = Parameter(
+        "parquet_dir",
+        help="Directory of the typed Parquet landing zone, one dataset per CSV file partitioned by date. "
+             "Empty to disable",
+        default=os.getenv("PARQUET_DIR", "")
+    )
+    video_days = Parameter(
+        "video_days",
+        help="Most recent days of item_daily_features kept per video. 1 keeps the latest snapshot only",
+        default=int(os.getenv("VIDEO_DAYS", "1"))
+    )
+    pool_size = Parameter(
+        "pool_size",
+        help="Tables of a branch written concurrently. Each table holds its own connection until it commits, "
+             "so the pool has at least one per mapped table",
+        default=int(os.getenv("POOL_SIZE", "4"))
+    )
 
     @step
     def start(self):
         """Start step - initialize database connection and prepare data ingestion"""
         logging.info(f"Load CSV files in the folder: ${self.data_dir}")
-        self.csv_files = [f for f in os.listdir(self.data_dir) if f.endswith('.csv')]
+        self.csv_files = list_csv_sources(self.data_dir)
         print(f"Found {len(self.csv_files)} CSV files: {self.csv_files}")
-        self.next(self.load_data)
+
+        self.sources = []
+        for csv_file in self.csv_files:
+            if source_name(csv_file) in TABLE_MAPPING:
+                self.sources.append(csv_file)
+            else:
+                print(f"Skipping {csv_file}: No matching table found in the database.")
+
+        # One branch per source file, so independent tables are loaded at the same time
+        self.next(self.load_data, foreach='sources')
 
     @step
     def load_data(self):
-        """Load data from CSV files into PostgreSQL"""
-        engine = create_engine(self.db_url)
+        """Load one CSV file into its PostgreSQL tables"""
+        csv_file = self.input
+        table_names = TABLE_MAPPING[source_name(csv_file)]
+        # Bounded pool shared by the writers of this branch, the loaders keep their connection
+        # until they commit, so fewer connections than tables would starve the last ones
+        engine = create_engine(self.db_url, pool_size=max(self.pool_size, len(table_names)), max_overflow=0)
         metadata = MetaData()
         metadata.reflect(bind=engine)
-        for csv_file in self.csv_files:
-            table_names = os.path.splitext(csv_file)[0]
-            table_names = TABLE_MAPPING.get(table_names, None)
-            csv_path = os.path.join(self.data_dir, csv_file)
 
-            if table_names is None:
-                print(f"Skipping {csv_file}: No matching table found in the database.")
-                continue
+        csv_path = os.path.join(self.data_dir, csv_file)
 
-            for table_name in table_names:
-                if table_name in metadata.tables:
-                    table = metadata.tables[table_name]
-                    self.ingest_csv_to_table(engine, csv_path, table)
-                else:
-                    print(f"Skipping {csv_file}: No matching table found in the database.")
+        tables = []
+        for table_name in table_names:
+            if table_name in metadata.tables:
+                tables.append(metadata.tables[table_name])
+            else:
+                print(f"Skipping {csv_file} for {table_name}: No matching table found in the database.")
 
-        self.next(self.end)
+        landing = None
+        if self.parquet_dir:
+            landing = ParquetLanding(os.path.join(self.parquet_dir, source_name(csv_file)), tables)
+
+        self.timings = {}
+        if tables:
+            self.timings = self.ingest_csv_to_tables(engine, csv_path, tables, landing)
+        engine.dispose()
+
+        if landing is not None:
+            print(f"Landed {landing.rows} rows of {csv_file} in {landing.root}.")
+
+        self.next(self.join_load)
 
-    def ingest_csv_to_table(self, engine, csv_path, table):
-        """Read CSV and insert into the specified table, ignoring missing columns"""
+    def ingest_csv_to_tables(self, engine, csv_path, tables, landing=None):
+        """Read CSV once and insert into each of the specified tables, ignoring missing columns"""
+        # Compact dtypes derived from the table columns, applied while parsing
+        dtypes = pandas_dtypes(tables)
         if "item_daily_features" in csv_path:
-            processor = ItemDailyFeaturesProcessor(engine=engine, csv_path=csv_path)
+            processor = ItemDailyFeaturesProcessor(engine=engine, csv_path=csv_path,
+                                                   chunksize=self.chunksize, loader=self.loader,
+                                                   landing=landing, dtypes=dtypes, n_days=self.video_days)
         else:
-            processor = BaseCSVProcess(engine=engine, csv_path=csv_path)
-        processor.process(table)
+            processor = BaseCSVProcess(engine=engine, csv_path=csv_path,
+                                       chunksize=self.chunksize, loader=self.loader, landing=landing,
+                                       dtypes=dtypes)
+        return processor.process_tables(tables, max_workers=self.pool_size)
+
+    @step
+    def join_load(self, inputs):
+        """Join the ingestion branches and report the time spent writing each table"""
+        self.timings = {}
+        for branch in inputs:
+            self.timings.update(branch.timings)
+
+        print("Ingestion timings:")
+        for table_name, elapsed in sorted(self.timings.items(), key=lambda item: -item[1]):
+            print(f"  {table_name:<24} {elapsed:8.1f}s")
+
+        self.next(self.end)
 
     @step
     def end(self):
@@ -1,31 +1,159 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
+import time
 import pandas as pd
 from abc import ABC, abstractmethod
 
 from sqlalchemy import Connection
+from sqlalchemy.pool import QueuePool
+
+from utils import open_source
+from utils.schema import memory_usage
+from .loaders import LOADERS, ToSqlLoader
 
 class BaseCSVProcess(ABC):
-    def __init__(self, engine: str | Connection, csv_path: str | Path):
+    def __init__(self, engine: str | Connection, csv_path: str | Path, chunksize: int | None = None,
+                 loader: str = "copy", landing=None, dtypes: dict | None = None):
         self.engine = engine
+        self.loader = LOADERS[loader]
+        # Optional ParquetLanding receiving the cleaned rows as they are read
+        self.landing = landing
 
+        # A CSV file, or a CSV member of a zip archive (`<archive>.zip/<member>`)
         self.csv_path = csv_path
-        self.df = pd.read_csv(csv_path, encoding='utf-8-sig', lineterminator='\n')
-        self.df = self.df.dropna()
+        # Rows per chunk in streaming mode. None loads the whole file at once.
+        self.chunksize = chunksize or None
+        self.df = None
+        # Dtypes pinned at parse time, for the columns the file has
+        self.dtypes = {}
+        if dtypes:
+            # Parse the header once, not once per dtype
+            columns = set(self.columns())
+            self.dtypes = {name: dtype for name, dtype in dtypes.items() if name in columns}
+        # Bytes of the pinned columns, and the estimate with inferred dtypes
+        self.memory = (0, 0)
+        if self.chunksize is None:
+            [self.df] = self.read_chunks()
 
-    def process(self, table):
-        # Filter DataFrame columns to match the table columns
-        db_columns = set(table.columns.keys())
-        df_columns = set(self.df.columns)
-        valid_columns = list(db_columns & df_columns)
+    @contextmanager
+    def read_csv(self, engine='c', **kwargs):
+        with open_source(self.csv_path) as f:
+            if engine == 'pyarrow':
+                # Multithreaded, but it does not support a custom line terminator nor chunks
+                yield pd.read_csv(f, encoding='utf-8-sig', engine='pyarrow', **kwargs)
+            else:
+                yield pd.read_csv(f, encoding='utf-8-sig', lineterminator='\n', **kwargs)
 
-        if not valid_columns:
-            print(f"Skipping {self.csv_path}: No matching columns found.")
-            return
-
-        # Insert data into the table
+    def read_whole(self) -> pd.DataFrame:
         try:
-            self.df[valid_columns].to_sql(table.name, self.engine, if_exists='replace', index=False)
-            print(f"Successfully ingested {self.csv_path} into {table.name}.")
+            with self.read_csv(engine='pyarrow', dtype=self.dtypes) as df:
+                return df
         except Exception as e:
-            print(f"Error inserting {self.csv_path} into {table.name}: {e}")
+            # e.g. '\r' inside unquoted fields, only the C parser can treat them as data
+            print(f"pyarrow could not parse {self.csv_path} ({e}), using the C parser.")
+            with self.read_csv(dtype=self.dtypes) as df:
+                return df
+
+    def parse(self) -> Iterator[pd.DataFrame]:
+        if self.chunksize is None:
+            yield self.read_whole()
+            return
+
+        with self.read_csv(chunksize=self.chunksize, dtype=self.dtypes) as reader:
+            yield from reader
+
+    def columns(self) -> list[str]:
+        if self.df is not None:
+            return list(self.df.columns)
+        # Only parse the header row
+        with self.read_csv(nrows=0) as header:
+            return list(header.columns)
+
+    def read_chunks(self) -> Iterator[pd.DataFrame]:
+        """Parse and clean the CSV, in chunks of `chunksize` rows when streaming."""
+        for chunk in self.parse():
+            chunk = chunk.dropna()
+            pinned, inferred = memory_usage(chunk, self.dtypes)
+            self.memory = (self.memory[0] + pinned, self.memory[1] + inferred)
+            if self.landing is not None:
+                self.landing.write(chunk)
+            yield chunk
+
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """Yield the rows to load, the whole file or one chunk at a time when streaming."""
+        if self.df is not None:
+            yield self.df
+            return
+
+        yield from self.read_chunks()
+
+    def table_rows(self, table, chunk) -> pd.DataFrame:
+        """Rows of the chunk written to `table`, all of them by default."""
+        return chunk
+
+    def process(self, table):
+        return self.process_tables([table])
+
+    def process_tables(self, tables, max_workers: int = 1) -> dict[str, float]:
+        """
+        Parse the source file once and project every chunk into each of the tables,
+        ignoring the columns a table does not have. Up to `max_workers` tables are
+        written concurrently. Returns the seconds spent writing each table.
+        The COPY based loaders hold a connection from the moment they are created until they
+        commit, so the engine's pool must have one per table.
+        """
+        pool = getattr(self.engine, "pool", None)
+        if self.loader is not ToSqlLoader and isinstance(pool, QueuePool) and pool._max_overflow >= 0:
+            capacity = pool.size() + pool._max_overflow
+            if capacity < len(tables):
+                raise ValueError(f"{len(tables)} tables are loaded from {self.csv_path} but the connection pool "
+                                 f"only holds {capacity} connections, raise pool_size.")
+
+        df_columns = set(self.columns())
+        loaders = []
+        for table in tables:
+            # Filter DataFrame columns to match the table columns
+            db_columns = set(table.columns.keys())
+            valid_columns = list(db_columns & df_columns)
+
+            if not valid_columns:
+                print(f"Skipping {self.csv_path} for {table.name}: No matching columns found.")
+                continue
+
+            try:
+                loaders.append(self.loader(self.engine, table, valid_columns))
+            except Exception as e:
+                print(f"Error inserting {self.csv_path} into {table.name}: {e}")
+
+        # Insert data into the tables
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            for chunk in self.iter_chunks():
+                futures = [(loader, executor.submit(loader.write, self.table_rows(loader.table, chunk)))
+                           for loader in loaders]
+                for loader, future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"Error inserting {self.csv_path} into {loader.table.name}: {e}")
+                        loader.abort()
+                        loaders.remove(loader)
 
+        timings = {}
+        for loader in loaders:
+            try:
+                loader.close()
+                timings[loader.table.name] = loader.elapsed
+                print(f"Successfully ingested {self.csv_path} into {loader.table.name}: "
+                      f"{loader.rows} rows in {loader.elapsed:.1f}s "
+                      f"({loader.rows / max(loader.elapsed, 1e-9):,.0f} rows/sec).")
+            except Exception as e:
+                print(f"Error inserting {self.csv_path} into {loader.table.name}: {e}")
+        print(f"Processed {self.csv_path} in {time.perf_counter() - start:.1f}s.")
+        if self.dtypes:
+            pinned, inferred = self.memory
+            print(f"Pinned dtypes of {self.csv_path}: {pinned / 2**20:,.1f} MiB instead of "
+                  f"~{inferred / 2**20:,.1f} MiB inferred, {(inferred - pinned) / 2**20:,.1f} MiB saved.")
+        return timings
@@ -1,9 +1,54 @@
+import pandas as pd
+
 from .base import BaseCSVProcess
 
+def latest_per_video(df, n_days=1):
+    """
+    Keep the `n_days` most recent rows of each video, ordered by video_id then date.
+    Rows with the same date keep their file order, the first one wins.
+    """
+    if n_days == 1:
+        # Faster than a sort + drop_duplicates on the daily features, see benchmark_latest.py
+        return df.loc[df.groupby("video_id")["date"].idxmax()].reset_index(drop=True)
+
+    # Sort the keys only, then take the selected rows instead of reordering every column
+    keys = pd.DataFrame({"video_id": df["video_id"].to_numpy("int64"), "date": df["date"].to_numpy("int64")})
+    keys = keys.sort_values(["video_id", "date"], ascending=[True, False], kind="mergesort")
+    keys = keys[keys.groupby("video_id", sort=False).cumcount() < n_days]
+    keys = keys.sort_values(["video_id", "date"], kind="mergesort")
+    return df.take(keys.index).reset_index(drop=True)
+
+
 class ItemDailyFeaturesProcessor(BaseCSVProcess):
-    def __init__(self, engine, csv_path):
-        super().__init__(engine, csv_path)
+    def __init__(self, engine, csv_path, chunksize=None, loader="copy", landing=None, dtypes=None, n_days=1):
+        # Rolling window of days kept per video, the latest snapshot by default
+        self.n_days = n_days
+        # (window, latest row of each video in it), shared by the tables keyed on video_id alone
+        self.latest_rows = None
+        super().__init__(engine, csv_path, chunksize, loader, landing, dtypes)
+        # Reduce once, every mapped table is then projected from the same rows
+        if self.df is not None:
+            self.df = self.latest(self.df)
+
+    def latest(self, df):
+        return latest_per_video(df, self.n_days)
+
+    def table_rows(self, table, chunk):
+        # Tables without a date column (video) are keyed on video_id alone, they get the latest row
+        if self.n_days > 1 and "date" not in table.columns:
+            if self.latest_rows is None or self.latest_rows[0] is not chunk:
+                self.latest_rows = (chunk, latest_per_video(chunk, 1))
+            return self.latest_rows[1]
+        return chunk
+
+    def iter_chunks(self):
+        if self.df is not None:
+            yield from super().iter_chunks()
+            return
 
-    def process(self, table):
-        self.df = self.df.loc[self.df.groupby(["video_id"])["date"].idxmax()].reset_index(drop=True)
-        super().process(table)
+        # Keep only the running latest rows per video, so memory is bounded by the number of videos
+        latest = None
+        for chunk in super().iter_chunks():
+            latest = self.latest(chunk if latest is None else pd.concat([latest, chunk], ignore_index=True))
+        if latest is not None:
+            yield latest
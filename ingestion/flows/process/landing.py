@@ -0,0 +1,51 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.schema import arrow_type, column_types
+
+# Column the landing datasets are partitioned by, when the source has it
+PARTITION_COLUMN = "date"
+
+
+class ParquetLanding:
+    """
+    Writes the cleaned rows of a CSV file as a typed Parquet dataset, partitioned
+    by `date` when the file has that column. Column types come from the tables the
+    file is mapped to, other columns keep the type pandas inferred.
+    """
+    def __init__(self, root, tables):
+        self.root = root
+        self.types = {
+            name: arrow_type(sql_type) for name, sql_type in column_types(tables).items()
+            if arrow_type(sql_type) is not None
+        }
+        self.parts = 0
+        self.rows = 0
+        # Each run lands the whole file again
+        shutil.rmtree(root, ignore_errors=True)
+        os.makedirs(root, exist_ok=True)
+
+    def write(self, chunk):
+        chunk = chunk.copy(deep=False)
+        for name, type_ in self.types.items():
+            if name in chunk.columns and pa.types.is_timestamp(type_):
+                chunk[name] = pd.to_datetime(chunk[name])
+
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        schema = pa.schema([
+            field.with_type(self.types.get(field.name, field.type)) for field in table.schema
+        ])
+        table = table.cast(schema)
+
+        partition_cols = [PARTITION_COLUMN] if PARTITION_COLUMN in table.column_names else None
+        pq.write_to_dataset(
+            table, self.root, partition_cols=partition_cols,
+            basename_template=f"part-{self.parts}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        self.parts += 1
+        self.rows += len(chunk)
@@ -0,0 +1,169 @@
+import io
+import time
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import Integer
+
+from utils import PARTITIONED_TABLES, WATERMARK_COLUMNS
+from utils.partitions import create_partitions, partition_days
+
+# Rows serialized per COPY buffer, so a whole-file DataFrame is not rendered to CSV at once
+COPY_BATCH_ROWS = 100_000
+
+
+class BaseLoader:
+    """
+    Writes the chunks of a source file into one table.
+    `write` is called once per chunk, then `close` commits (or `abort` rolls back).
+    """
+    def __init__(self, engine, table, columns):
+        self.engine = engine
+        self.table = table
+        self.columns = columns
+        self.rows = 0
+        # Seconds spent writing, excluding the time spent parsing the source file
+        self.elapsed = 0.0
+
+    def write(self, chunk):
+        start = time.perf_counter()
+        self.rows += self._write(chunk[self.columns])
+        self.elapsed += time.perf_counter() - start
+
+    def _write(self, chunk) -> int:
+        """Write the chunk and return the number of rows written."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class ToSqlLoader(BaseLoader):
+    """Write the chunks with DataFrame.to_sql, replacing the table on the first chunk."""
+    def __init__(self, engine, table, columns):
+        super().__init__(engine, table, columns)
+        if table.name in PARTITIONED_TABLES:
+            raise ValueError(f"{table.name} is partitioned and would be replaced by a plain table, "
+                             "use the 'copy' or 'upsert' loader.")
+        self.if_exists = 'replace'
+
+    def _write(self, chunk):
+        chunk.to_sql(self.table.name, self.engine, if_exists=self.if_exists, index=False)
+        self.if_exists = 'append'
+        return len(chunk)
+
+
+class CopyLoader(BaseLoader):
+    """
+    Truncate the table and stream the chunks into it with `COPY ... FROM STDIN` (CSV format).
+    Unlike to_sql, the table definition (primary keys, types) is kept.
+    """
+    def __init__(self, engine, table, columns):
+        super().__init__(engine, table, columns)
+        # Columns parsed as float because of missing values would be written as "1.0"
+        self.int_columns = [c for c in columns if isinstance(table.columns[c].type, Integer)]
+        self.column_list = ", ".join(f'"{c}"' for c in columns)
+
+        # Daily partitions of the table that exist or were created by this load
+        self.partition_column = PARTITIONED_TABLES.get(table.name)
+        self.partitions = set()
+
+        self.conn = engine.raw_connection()
+        self.cursor = self.conn.cursor()
+        try:
+            target = self.prepare()
+        except Exception:
+            # The loader is dropped by the caller, give the connection back to the pool
+            self.abort()
+            raise
+        self.copy_sql = f'COPY "{target}" ({self.column_list}) FROM STDIN WITH (FORMAT csv)'
+
+    def prepare(self) -> str:
+        """Prepare the table the rows are copied into and return its name."""
+        self.cursor.execute(f'TRUNCATE TABLE "{self.table.name}"')
+        return self.table.name
+
+    def create_partitions(self, chunk):
+        # In the load's own transaction, not a separate one: TRUNCATE (and the COPY) already lock
+        # the parent until commit, so another connection creating a partition of it would wait on
+        # this load. Concurrent loads of the table serialize on the advisory lock until they commit.
+        days = [day for day in partition_days(chunk[self.partition_column]) if day not in self.partitions]
+        if days:
+            create_partitions(self.cursor, self.table.name, days)
+            self.partitions.update(days)
+
+    def _write(self, chunk):
+        if self.partition_column is not None:
+            self.create_partitions(chunk)
+        for start in range(0, len(chunk), COPY_BATCH_ROWS):
+            batch = chunk.iloc[start:start + COPY_BATCH_ROWS]
+            batch = batch.astype({c: 'int64' for c in self.int_columns})
+            buf = io.StringIO()
+            batch.to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            self.cursor.copy_expert(self.copy_sql, buf)
+        return len(chunk)
+
+    def close(self):
+        self.cursor.close()
+        self.conn.commit()
+        self.conn.close()
+
+    def abort(self):
+        self.cursor.close()
+        self.conn.rollback()
+        self.conn.close()
+
+
+class UpsertLoader(CopyLoader):
+    """
+    Incremental load. Only rows newer than the table's watermark (the max of its
+    WATERMARK_COLUMNS column, if it has one) are copied into a temporary table,
+    then merged with `INSERT ... ON CONFLICT` on the table's primary key.
+    """
+    def prepare(self):
+        self.primary_key = [c.name for c in self.table.primary_key.columns]
+        if not self.primary_key or not set(self.primary_key) <= set(self.columns):
+            raise ValueError(f"{self.table.name} has no primary key matching the CSV columns. "
+                             "Tables recreated by the 'to_sql' loader lose their keys, run the alembic migrations again.")
+
+        self.watermark_column = WATERMARK_COLUMNS.get(self.table.name)
+        if self.watermark_column not in self.columns:
+            self.watermark_column = None
+        self.watermark = None
+        if self.watermark_column is not None:
+            self.cursor.execute(f'SELECT max("{self.watermark_column}") FROM "{self.table.name}"')
+            self.watermark = self.cursor.fetchone()[0]
+        print(f"Upserting into {self.table.name} rows with {self.watermark_column} > {self.watermark}.")
+
+        staging = f"{self.table.name}_staging"
+        self.cursor.execute(f'CREATE TEMP TABLE "{staging}" ON COMMIT DROP AS '
+                            f'SELECT {self.column_list} FROM "{self.table.name}" WITH NO DATA')
+        return staging
+
+    def _write(self, chunk):
+        if self.watermark is not None:
+            values = chunk[self.watermark_column]
+            if isinstance(self.watermark, datetime):
+                values = pd.to_datetime(values)
+            chunk = chunk[values > self.watermark]
+        return super()._write(chunk)
+
+    def close(self):
+        conflict = ", ".join(f'"{c}"' for c in self.primary_key)
+        updates = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in self.columns if c not in self.primary_key)
+        action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        self.cursor.execute(f'INSERT INTO "{self.table.name}" ({self.column_list}) '
+                            f'SELECT {self.column_list} FROM "{self.table.name}_staging" '
+                            f'ON CONFLICT ({conflict}) {action}')
+        super().close()
+
+
+LOADERS = {
+    "to_sql": ToSqlLoader,
+    "copy": CopyLoader,
+    "upsert": UpsertLoader,
+}
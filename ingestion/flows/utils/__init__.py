@@ -1 +1,2 @@
-from .table_mapping import TABLE_MAPPING
\ No newline at end of file
+from .table_mapping import TABLE_MAPPING, WATERMARK_COLUMNS, PARTITIONED_TABLES
+from .sources import open_source, list_csv_sources, source_name
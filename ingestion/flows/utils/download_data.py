@@ -1,8 +1,12 @@
 import os
+import shutil
+import hashlib
+import threading
 import requests
 import zipfile
 import logging
 import gdown
+from concurrent.futures import ThreadPoolExecutor
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,24 +15,16 @@ logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %
 FILE_ID = "1qe5hOSBxzIuxBb1G_Ih5X-O65QElollE"
 DEST_FOLDER = os.getenv("DATA_DIR", "./data")  # Path inside the Docker container where data should be placed
 ZIP_PATH = os.path.join(DEST_FOLDER, "KuaiRec.zip")
-
-def download_and_unzip(file_id, zip_path, extract_to):
-    """
-    Downloads a zip file from Google Drive using gdown and extracts it.
-    """
-    # Construct the download URL
-    url = f"https://drive.google.com/uc?id={file_id}"
-    
-    print("Downloading data from Google Drive using gdown...")
-    gdown.download(url, zip_path, quiet=False)
-
-    print("Unzipping the downloaded file...")
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_to)
-
-    print(f"Data has been extracted to {extract_to}")
-    os.remove(zip_path)  # Clean up the zip file
-
+# Direct link to the archive, fetched with parallel range requests when the server supports them
+DATASET_URL = os.getenv("DATASET_URL", f"https://drive.google.com/uc?id={FILE_ID}")
+DATASET_SHA256 = os.getenv("DATASET_SHA256")
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "8"))
+RANGE_SIZE = 16 * 1024 * 1024
+# Seconds to wait for the server to respond or send the next bytes
+REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "60"))
+# Keep the archive as is, the ingestion flow reads its CSV members without extracting them.
+# KEEP_ARCHIVE=0 extracts the CSV files and removes the archive instead.
+KEEP_ARCHIVE = os.getenv("KEEP_ARCHIVE", "1") == "1"
 
 def download_file_from_google_drive(file_id, destination):
     """
@@ -77,26 +73,111 @@ def save_response_content(response, destination):
     
     logging.info(f"File saved to {destination}")
 
-def unzip_file(zip_path, extract_to):
+def download_ranged(url, destination, workers=DOWNLOAD_WORKERS, range_size=RANGE_SIZE, sha256=None):
     """
-    Unzips a file to the specified directory.
+    Downloads a file with parallel HTTP range requests.
+
+    Bytes are written in place into `<destination>.part`, and the index of every
+    completed range is appended to `<destination>.part.ranges`, so an interrupted
+    download resumes with the missing ranges only. The file is renamed to
+    `destination` once complete and, if `sha256` is given, verified.
+    Falls back to a single gdown stream when the server does not accept ranges (Google Drive).
     """
-    logging.debug(f"Unzipping file: {zip_path} to {extract_to}")
-    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-        zip_ref.extractall(extract_to)
-    logging.info(f"File unzipped to {extract_to}")
+    os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+    head = requests.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+    head.raise_for_status()
+    size = int(head.headers.get("Content-Length", 0))
+    if size == 0 or head.headers.get("Accept-Ranges") != "bytes":
+        logging.info("Server does not support range requests, downloading in a single stream")
+        gdown.download(url, destination, quiet=False)
+        verify_checksum(destination, sha256)
+        return destination
+
+    part_path = destination + ".part"
+    ranges_path = part_path + ".ranges"
+    ranges = [(start, min(start + range_size, size) - 1) for start in range(0, size, range_size)]
+
+    done = set()
+    if os.path.exists(part_path) and os.path.getsize(part_path) == size and os.path.exists(ranges_path):
+        with open(ranges_path) as f:
+            done = {int(line) for line in f if line.strip()}
+        logging.info(f"Resuming download: {len(done)}/{len(ranges)} ranges already fetched")
+    else:
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+        open(ranges_path, "w").close()
+
+    lock = threading.Lock()
+    fd = os.open(part_path, os.O_WRONLY)
+
+    def fetch(index):
+        start, end = ranges[index]
+        response = requests.get(url, headers={"Range": f"bytes={start}-{end}"}, stream=True,
+                                timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise IOError(f"Expected a partial response for bytes {start}-{end}, got {response.status_code}")
+        offset = start
+        for chunk in response.iter_content(1024 * 1024):
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)
+        if offset != end + 1:
+            raise IOError(f"Incomplete range {start}-{end}: received {offset - start} bytes")
+        with lock, open(ranges_path, "a") as f:
+            f.write(f"{index}\n")
+
+    try:
+        todo = [index for index in range(len(ranges)) if index not in done]
+        logging.debug(f"Downloading {size} bytes from {url} in {len(todo)} ranges with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(fetch, todo))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+    verify_checksum(part_path, sha256)
+    os.replace(part_path, destination)
+    os.remove(ranges_path)
+    logging.info(f"File saved to {destination}")
+    return destination
 
-def remove_non_csv_files(directory):
+def verify_checksum(path, sha256):
     """
-    Removes all files in the specified directory that are not in CSV format.
+    Checks the SHA-256 digest of a file, if an expected digest is given.
     """
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if not file.lower().endswith('.csv'):
-                file_path = os.path.join(root, file)
-                logging.debug(f"Removing non-CSV file: {file_path}")
-                os.remove(file_path)
-    logging.info("Non-CSV files removed.")
+    if not sha256:
+        return
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    if digest.hexdigest() != sha256.lower():
+        raise ValueError(f"Checksum mismatch for {path}: expected {sha256}, got {digest.hexdigest()}")
+    logging.info(f"Checksum verified for {path}")
+
+def extract_csv_members(zip_path, extract_to):
+    """
+    Streams only the CSV members of a zip file to the specified directory.
+    Members already extracted with the same size are skipped, members whose path
+    leads outside `extract_to` (absolute or with `..`) are refused.
+    """
+    logging.debug(f"Extracting CSV files from {zip_path} to {extract_to}")
+    root = os.path.realpath(extract_to)
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for member in zip_ref.infolist():
+            if member.is_dir() or not member.filename.lower().endswith('.csv'):
+                continue
+            target = os.path.realpath(os.path.join(root, member.filename))
+            if os.path.commonpath([root, target]) != root:
+                raise ValueError(f"Refusing to extract {member.filename} outside {extract_to}")
+            if os.path.exists(target) and os.path.getsize(target) == member.file_size:
+                logging.debug(f"Already extracted: {target}")
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with zip_ref.open(member) as source, open(target, "wb") as dest:
+                shutil.copyfileobj(source, dest, 1024 * 1024)
+            logging.debug(f"Extracted {member.filename}")
+    logging.info(f"CSV files extracted to {extract_to}")
 
 def main():
     """
@@ -106,22 +187,21 @@ def main():
     logging.debug(f"Destination folder: {DEST_FOLDER}, Zip path: {ZIP_PATH}")
     
     try:
-        logging.info("Downloading data from Google Drive...")
-        download_file_from_google_drive(FILE_ID, ZIP_PATH)
+        logging.info(f"Downloading data from {DATASET_URL}...")
+        download_ranged(DATASET_URL, ZIP_PATH, sha256=DATASET_SHA256)
+        if KEEP_ARCHIVE:
+            logging.info(f"Archive kept at {ZIP_PATH}")
+            return
 
-        logging.info("Unzipping the downloaded file...")
-        unzip_file(ZIP_PATH, DEST_FOLDER)
+        logging.info("Extracting the CSV files...")
+        extract_csv_members(ZIP_PATH, DEST_FOLDER)
 
         logging.info(f"Data has been extracted to {DEST_FOLDER}")
         os.remove(ZIP_PATH)  # Clean up the zip file
         logging.debug(f"Zip file {ZIP_PATH} removed.")
-
-        logging.info("Removing non-CSV files...")
-        remove_non_csv_files(DEST_FOLDER)
     
     except Exception as e:
         logging.error(f"An error occurred: {e}", exc_info=True)
 
 if __name__ == "__main__":
-    # main()
-    download_and_unzip(FILE_ID, ZIP_PATH, DEST_FOLDER)
+    main()
@@ -0,0 +1,80 @@
+"""
+Daily range partitions of the tables listed in PARTITIONED_TABLES (see postgres/models).
+Partition `<table>_pYYYYMMDD` holds the rows of one day, the ingestion creates the
+missing ones before loading rows, and retention detaches the old ones instead of
+deleting their rows.
+
+    python -m utils.partitions <table> <YYYY-MM-DD> [--drop]
+
+detaches (and drops) the partitions of the days before the given date.
+"""
+import sys
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from .table_mapping import PARTITIONED_TABLES
+
+
+def partition_name(table: str, day: date) -> str:
+    return f"{table}_p{day:%Y%m%d}"
+
+
+def partition_days(values) -> list[date]:
+    """Days spanned by the partition column values of a chunk."""
+    days = pd.to_datetime(pd.Series(values), format="ISO8601").dropna().dt.normalize().unique()
+    return sorted(pd.Timestamp(day).date() for day in days)
+
+
+def create_partitions(cursor, table: str, days) -> None:
+    """
+    Create the missing partitions of `table` for the days, with the DBAPI cursor of the
+    transaction loading the rows. Concurrent loads of the table wait on an advisory lock,
+    so they do not race to create the same partition.
+    """
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (table,))
+    for day in days:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{partition_name(table, day)}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+        )
+
+
+def list_partitions(conn, table: str) -> list[str]:
+    rows = conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table ORDER BY child.relname"
+    ), {"table": table})
+    return [name for (name,) in rows]
+
+
+def detach_partitions(engine, table: str, before: date, drop: bool = False) -> list[str]:
+    """
+    Detach the partitions of the days before `before`, a catalog update instead of a DELETE
+    of their rows. Detached partitions stay as standalone tables unless `drop` is set.
+    """
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(f"{table} is not a partitioned table.")
+
+    detached = []
+    with engine.begin() as conn:
+        for name in list_partitions(conn, table):
+            day = datetime.strptime(name.rsplit("_p", 1)[1], "%Y%m%d").date()
+            if day >= before:
+                continue
+            conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            if drop:
+                conn.execute(text(f'DROP TABLE "{name}"'))
+            detached.append(name)
+    print(f"{'Dropped' if drop else 'Detached'} {len(detached)} partitions of {table} before {before}.")
+    return detached
+
+
+if __name__ == "__main__":
+    import os
+
+    table, before = sys.argv[1], datetime.strptime(sys.argv[2], "%Y-%m-%d").date()
+    detach_partitions(create_engine(os.environ["DB_URL"]), table, before, drop="--drop" in sys.argv)
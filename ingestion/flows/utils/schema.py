@@ -0,0 +1,81 @@
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import BigInteger, Boolean, Date, DateTime, Float, Integer, SmallInteger, String
+
+
+def column_types(tables):
+    """
+    Merges the SQLAlchemy column types of the tables a CSV file is mapped to.
+    The reflected tables mirror the models declared in postgres/models.
+    """
+    types = {}
+    for table in tables:
+        for column in table.columns:
+            types.setdefault(column.name, column.type)
+    return types
+
+
+def arrow_type(sql_type):
+    """Arrow type of a SQLAlchemy column type, None when it has no fixed mapping."""
+    # Subclasses first: BigInteger and SmallInteger are Integers
+    if isinstance(sql_type, BigInteger):
+        return pa.int64()
+    if isinstance(sql_type, SmallInteger):
+        return pa.int16()
+    if isinstance(sql_type, Integer):
+        return pa.int32()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp('ms')
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    if isinstance(sql_type, String):
+        return pa.string()
+    return None
+
+
+def pandas_dtype(sql_type):
+    """
+    Compact pandas dtype of a SQLAlchemy column type, None to let pandas infer it.
+    Integers are nullable since rows with missing values are only dropped after parsing.
+    """
+    if isinstance(sql_type, BigInteger):
+        return "Int64"
+    if isinstance(sql_type, SmallInteger):
+        return "Int16"
+    if isinstance(sql_type, Integer):
+        return "Int32"
+    if isinstance(sql_type, Float):
+        return "float64"
+    if isinstance(sql_type, String):
+        return "category"
+    return None
+
+
+def pandas_dtypes(tables):
+    """Dtype map applied when parsing a CSV file mapped to the tables."""
+    return {
+        name: pandas_dtype(sql_type) for name, sql_type in column_types(tables).items()
+        if pandas_dtype(sql_type) is not None
+    }
+
+
+def memory_usage(df, dtypes):
+    """
+    Bytes used by the pinned columns of the frame, and an estimate of the bytes they
+    would use with the int64/float64/object types pandas infers.
+    """
+    pinned = inferred = 0
+    for name in dtypes:
+        if name not in df.columns:
+            continue
+        column = df[name]
+        pinned += column.memory_usage(index=False, deep=True)
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            inferred += column.astype(object).memory_usage(index=False, deep=True)
+        else:
+            inferred += 8 * len(column)
+    return pinned, inferred
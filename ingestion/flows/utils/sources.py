@@ -0,0 +1,67 @@
+import os
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def split_archive_path(path):
+    """
+    Splits `<dir>/<archive>.zip/<member>` into (archive, member).
+    Returns (path, None) for a regular file.
+    """
+    parts = Path(path).parts
+    for i, part in enumerate(parts[:-1]):
+        if part.lower().endswith('.zip'):
+            archive = os.path.join(*parts[:i + 1])
+            if os.path.isfile(archive):
+                return archive, "/".join(parts[i + 1:])
+    return path, None
+
+
+@contextmanager
+def open_source(path):
+    """
+    Opens a CSV file, or a CSV member of a zip archive, as a binary stream.
+    Archive members are decompressed on the fly while they are read.
+    """
+    archive, member = split_archive_path(path)
+    if member is None:
+        with open(path, 'rb') as f:
+            yield f
+    else:
+        with zipfile.ZipFile(archive) as zip_ref, zip_ref.open(member) as f:
+            yield f
+
+
+def source_name(path):
+    """Key of a CSV file, or of a zip archive member, in TABLE_MAPPING"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def list_csv_sources(data_dir):
+    """
+    Lists the CSV files of a directory and the CSV members of its zip archives,
+    as paths relative to the directory.
+    Each source name is listed once: a CSV extracted next to the archive it comes from
+    (or left by an interrupted extraction) is skipped in favor of the archive member.
+    """
+    members, files = [], []
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        if name.lower().endswith('.csv'):
+            files.append(name)
+        elif name.lower().endswith('.zip') and os.path.isfile(path):
+            with zipfile.ZipFile(path) as zip_ref:
+                members.extend(
+                    f"{name}/{member.filename}" for member in zip_ref.infolist()
+                    if not member.is_dir() and member.filename.lower().endswith('.csv')
+                )
+
+    sources = {}
+    for source in members + files:
+        name = source_name(source)
+        if name in sources:
+            print(f"Skipping {source}: {name} is already read from {sources[name]}.")
+            continue
+        sources[name] = source
+    return sorted(sources.values())
@@ -1,6 +1,20 @@
 TABLE_MAPPING = {
     "small_matrix": ["user_interaction"],
-    "item_daily_features": ["user_engagement", "video", "video_interaction", "video_statistic"],
+    "item_daily_features": ["user_engagement", "video", "video_interaction", "video_statistic", "video_daily_rollup"],
     "user_features": ["user", "user_onehot_features"],
     "kuairec_caption_category": ["video_caption"]
-}
\ No newline at end of file
+}
+
+# Column holding the event date of each row, used as the watermark of incremental loads
+WATERMARK_COLUMNS = {
+    "user_interaction": "time",
+    "user_engagement": "date",
+    "video_interaction": "date",
+    "video_statistic": "date",
+    "video_daily_rollup": "date",
+}
+
+# Tables partitioned by day on the given column, see utils/partitions.py
+PARTITIONED_TABLES = {
+    "user_interaction": "time",
+}
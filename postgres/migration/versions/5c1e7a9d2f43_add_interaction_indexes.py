@@ -0,0 +1,45 @@
+"""Add indexes on the interaction and statistics tables
+
+Revision ID: 5c1e7a9d2f43
+Revises: b83449021fd5
+Create Date: 2026-10-18 10:12:41.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e7a9d2f43'
+down_revision: Union[str, None] = 'b83449021fd5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Daily tables, filtered by date range by the staging models and the upsert loader watermark
+DAILY_TABLES = ['video_statistic', 'video_interaction', 'user_engagement']
+
+
+def upgrade() -> None:
+    # BRIN indexes are a few pages large and fit rows appended in date order, as the ingestion does
+    op.create_index('ix_user_interaction_time_brin', 'user_interaction', ['time'],
+                    postgresql_using='brin')
+    for table in DAILY_TABLES:
+        op.create_index(f'ix_{table}_date_brin', table, ['date'], postgresql_using='brin')
+
+    # filtered_user_interaction selects the days of a user, user_interaction_staging projects
+    # video_id and play_duration: the scan is answered from the index alone
+    op.create_index('ix_user_interaction_user_id_time', 'user_interaction', ['user_id', 'time'],
+                    postgresql_include=['video_id', 'play_duration'])
+    # joined_user_interaction joins the interactions with the videos on video_id
+    op.create_index('ix_user_interaction_video_id', 'user_interaction', ['video_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_interaction_video_id', table_name='user_interaction')
+    op.drop_index('ix_user_interaction_user_id_time', table_name='user_interaction')
+    for table in DAILY_TABLES:
+        op.drop_index(f'ix_{table}_date_brin', table_name=table)
+    op.drop_index('ix_user_interaction_time_brin', table_name='user_interaction')
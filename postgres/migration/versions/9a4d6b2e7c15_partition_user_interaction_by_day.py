@@ -0,0 +1,92 @@
+"""Partition user_interaction by day on time
+
+Revision ID: 9a4d6b2e7c15
+Revises: 5c1e7a9d2f43
+Create Date: 2026-10-18 11:03:27.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4d6b2e7c15'
+down_revision: Union[str, None] = '5c1e7a9d2f43'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = ['ix_user_interaction_time_brin', 'ix_user_interaction_user_id_time', 'ix_user_interaction_video_id']
+
+
+def create_indexes() -> None:
+    # Created on the parent, Postgres adds them to every partition, present and future
+    op.create_index('ix_user_interaction_time_brin', 'user_interaction', ['time'],
+                    postgresql_using='brin')
+    op.create_index('ix_user_interaction_user_id_time', 'user_interaction', ['user_id', 'time'],
+                    postgresql_include=['video_id', 'play_duration'])
+    op.create_index('ix_user_interaction_video_id', 'user_interaction', ['video_id'])
+
+
+def upgrade() -> None:
+    # A table recreated by the 'to_sql' loader has neither these indexes nor a primary key,
+    # and its columns are BIGINT / DOUBLE / TEXT instead of the model types
+    for index in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {index}')
+    op.execute('ALTER TABLE user_interaction DROP CONSTRAINT IF EXISTS user_interaction_pkey')
+    op.rename_table('user_interaction', 'user_interaction_unpartitioned')
+
+    # The partition key has to be part of the primary key
+    op.create_table('user_interaction',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('video_id', sa.Integer(), nullable=False),
+        sa.Column('play_duration', sa.Integer(), nullable=True),
+        sa.Column('time', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'video_id', 'time'),
+        postgresql_partition_by='RANGE (time)',
+    )
+
+    # One partition per day of the existing rows, the ingestion creates the next ones
+    op.execute("""
+        DO $$
+        DECLARE
+            day date;
+        BEGIN
+            FOR day IN SELECT DISTINCT time::timestamp::date FROM user_interaction_unpartitioned
+                       WHERE time IS NOT NULL
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF user_interaction FOR VALUES FROM (%L) TO (%L)',
+                    'user_interaction_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                );
+            END LOOP;
+        END $$
+    """)
+    # Duplicate (user_id, video_id, time) rows are possible without the former primary key
+    op.execute('INSERT INTO user_interaction (user_id, video_id, play_duration, time) '
+               'SELECT user_id::integer, video_id::integer, play_duration::integer, time::timestamp '
+               'FROM user_interaction_unpartitioned '
+               'WHERE user_id IS NOT NULL AND video_id IS NOT NULL AND time IS NOT NULL '
+               'ON CONFLICT DO NOTHING')
+    op.drop_table('user_interaction_unpartitioned')
+    create_indexes()
+
+
+def downgrade() -> None:
+    op.rename_table('user_interaction', 'user_interaction_partitioned')
+    op.create_table('user_interaction',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('video_id', sa.Integer(), nullable=False),
+        sa.Column('play_duration', sa.Integer(), nullable=True),
+        sa.Column('time', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id', 'video_id'),
+    )
+    # Without time in the key, only the latest interaction of a (user, video) pair is kept
+    op.execute('INSERT INTO user_interaction (user_id, video_id, play_duration, time) '
+               'SELECT DISTINCT ON (user_id, video_id) user_id, video_id, play_duration, time '
+               'FROM user_interaction_partitioned ORDER BY user_id, video_id, time DESC')
+    # Drops the partitions along with the parent
+    op.drop_table('user_interaction_partitioned')
+    create_indexes()
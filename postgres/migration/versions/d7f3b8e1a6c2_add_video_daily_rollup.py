@@ -0,0 +1,110 @@
+"""Add the video_daily_rollup table
+
+Revision ID: d7f3b8e1a6c2
+Revises: 9a4d6b2e7c15
+Create Date: 2026-10-18 12:26:09.117843
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f3b8e1a6c2'
+down_revision: Union[str, None] = '9a4d6b2e7c15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('video_daily_rollup',
+    sa.Column('video_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Integer(), nullable=False),
+    sa.Column('like_cnt', sa.Integer(), nullable=True),
+    sa.Column('like_user_num', sa.Integer(), nullable=True),
+    sa.Column('click_like_cnt', sa.Integer(), nullable=True),
+    sa.Column('double_click_cnt', sa.Integer(), nullable=True),
+    sa.Column('cancel_like_cnt', sa.Integer(), nullable=True),
+    sa.Column('cancel_like_user_num', sa.Integer(), nullable=True),
+    sa.Column('comment_cnt', sa.Integer(), nullable=True),
+    sa.Column('comment_user_num', sa.Integer(), nullable=True),
+    sa.Column('direct_comment_cnt', sa.Integer(), nullable=True),
+    sa.Column('reply_comment_cnt', sa.Integer(), nullable=True),
+    sa.Column('delete_comment_cnt', sa.Integer(), nullable=True),
+    sa.Column('delete_comment_user_num', sa.Integer(), nullable=True),
+    sa.Column('comment_like_cnt', sa.Integer(), nullable=True),
+    sa.Column('comment_like_user_num', sa.Integer(), nullable=True),
+    sa.Column('follow_cnt', sa.Integer(), nullable=True),
+    sa.Column('follow_user_num', sa.Integer(), nullable=True),
+    sa.Column('cancel_follow_cnt', sa.Integer(), nullable=True),
+    sa.Column('cancel_follow_user_num', sa.Integer(), nullable=True),
+    sa.Column('share_cnt', sa.Integer(), nullable=True),
+    sa.Column('share_user_num', sa.Integer(), nullable=True),
+    sa.Column('download_cnt', sa.Integer(), nullable=True),
+    sa.Column('download_user_num', sa.Integer(), nullable=True),
+    sa.Column('report_cnt', sa.Integer(), nullable=True),
+    sa.Column('report_user_num', sa.Integer(), nullable=True),
+    sa.Column('reduce_similar_cnt', sa.Integer(), nullable=True),
+    sa.Column('reduce_similar_user_num', sa.Integer(), nullable=True),
+    sa.Column('collect_cnt', sa.Integer(), nullable=True),
+    sa.Column('collect_user_num', sa.Integer(), nullable=True),
+    sa.Column('cancel_collect_cnt', sa.Integer(), nullable=True),
+    sa.Column('cancel_collect_user_num', sa.Integer(), nullable=True),
+    sa.Column('show_cnt', sa.Integer(), nullable=True),
+    sa.Column('show_user_num', sa.Integer(), nullable=True),
+    sa.Column('play_cnt', sa.Integer(), nullable=True),
+    sa.Column('play_user_num', sa.Integer(), nullable=True),
+    sa.Column('play_duration', sa.Integer(), nullable=True),
+    sa.Column('complete_play_cnt', sa.Integer(), nullable=True),
+    sa.Column('complete_play_user_num', sa.Integer(), nullable=True),
+    sa.Column('valid_play_cnt', sa.Integer(), nullable=True),
+    sa.Column('valid_play_user_num', sa.Integer(), nullable=True),
+    sa.Column('long_time_play_cnt', sa.Integer(), nullable=True),
+    sa.Column('long_time_play_user_num', sa.Integer(), nullable=True),
+    sa.Column('short_time_play_cnt', sa.Integer(), nullable=True),
+    sa.Column('short_time_play_user_num', sa.Integer(), nullable=True),
+    sa.Column('play_progress', sa.Float(), nullable=True),
+    sa.Column('comment_stay_duration', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('video_id', 'date')
+    )
+    op.create_index('ix_video_daily_rollup_date_brin', 'video_daily_rollup', ['date'],
+                    postgresql_using='brin')
+
+    # Backfill from the daily tables, the ingestion maintains it from now on
+    op.execute("""
+        INSERT INTO video_daily_rollup (video_id, date,
+               like_cnt, like_user_num, click_like_cnt, double_click_cnt, cancel_like_cnt,
+               cancel_like_user_num, comment_cnt, comment_user_num, direct_comment_cnt,
+               reply_comment_cnt, delete_comment_cnt, delete_comment_user_num, comment_like_cnt,
+               comment_like_user_num, follow_cnt, follow_user_num, cancel_follow_cnt,
+               cancel_follow_user_num, share_cnt, share_user_num, download_cnt, download_user_num,
+               report_cnt, report_user_num, reduce_similar_cnt, reduce_similar_user_num,
+               collect_cnt, collect_user_num, cancel_collect_cnt, cancel_collect_user_num,
+               show_cnt, show_user_num, play_cnt, play_user_num, play_duration, complete_play_cnt,
+               complete_play_user_num, valid_play_cnt, valid_play_user_num, long_time_play_cnt,
+               long_time_play_user_num, short_time_play_cnt, short_time_play_user_num,
+               play_progress, comment_stay_duration)
+        SELECT vi.video_id, vi.date,
+               vi.like_cnt, vi.like_user_num, vi.click_like_cnt, vi.double_click_cnt,
+               vi.cancel_like_cnt, vi.cancel_like_user_num, vi.comment_cnt, vi.comment_user_num,
+               vi.direct_comment_cnt, vi.reply_comment_cnt, vi.delete_comment_cnt,
+               vi.delete_comment_user_num, vi.comment_like_cnt, vi.comment_like_user_num,
+               vi.follow_cnt, vi.follow_user_num, vi.cancel_follow_cnt, vi.cancel_follow_user_num,
+               vi.share_cnt, vi.share_user_num, vi.download_cnt, vi.download_user_num,
+               vi.report_cnt, vi.report_user_num, vi.reduce_similar_cnt,
+               vi.reduce_similar_user_num, vi.collect_cnt, vi.collect_user_num,
+               vi.cancel_collect_cnt, vi.cancel_collect_user_num, vs.show_cnt, vs.show_user_num,
+               vs.play_cnt, vs.play_user_num, vs.play_duration, vs.complete_play_cnt,
+               vs.complete_play_user_num, vs.valid_play_cnt, vs.valid_play_user_num,
+               vs.long_time_play_cnt, vs.long_time_play_user_num, vs.short_time_play_cnt,
+               vs.short_time_play_user_num, vs.play_progress, vs.comment_stay_duration
+        FROM video_interaction vi
+        JOIN video_statistic vs ON vs.video_id = vi.video_id AND vs.date = vi.date
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_video_daily_rollup_date_brin', table_name='video_daily_rollup')
+    op.drop_table('video_daily_rollup')
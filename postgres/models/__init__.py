@@ -7,6 +7,7 @@ from .video_caption import VideoCaption
 from .user_engagement import UserEngagement
 from .user_onehot_features import UserOnehotFeatures
 from .user_interaction import UserInteraction
+from .video_daily_rollup import VideoDailyRollup
 
 
 # from models.base import Base
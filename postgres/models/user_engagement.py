@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from .base import Base
 
 class UserEngagement(Base):
@@ -14,3 +14,7 @@ class UserEngagement(Base):
     collect_user_num = Column(Integer, default=0)
     cancel_collect_cnt = Column(Integer, default=0)
     cancel_collect_user_num = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index('ix_user_engagement_date_brin', 'date', postgresql_using='brin'),
+    )
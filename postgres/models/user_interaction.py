@@ -1,11 +1,20 @@
 from .base import Base
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 
 
 class UserInteraction(Base):
     __tablename__ = 'user_interaction'
-    
+
     user_id = Column(Integer, primary_key=True)
     video_id = Column(Integer, primary_key=True)
     play_duration = Column(Integer)  # milliseconds
-    time = Column(DateTime)
+    # Partition key, one partition per day (user_interaction_pYYYYMMDD) created by the ingestion
+    time = Column(DateTime, primary_key=True)
+
+    __table_args__ = (
+        Index('ix_user_interaction_time_brin', 'time', postgresql_using='brin'),
+        Index('ix_user_interaction_user_id_time', 'user_id', 'time',
+              postgresql_include=['video_id', 'play_duration']),
+        Index('ix_user_interaction_video_id', 'video_id'),
+        {'postgresql_partition_by': 'RANGE (time)'},
+    )
@@ -0,0 +1,60 @@
+from sqlalchemy import Column, Integer, Float, Index
+from .base import Base
+
+# One wide row per video and day: the columns of VideoInteraction and VideoStatistic, which
+# include the UserEngagement ones. Loaded from item_daily_features along with those tables,
+# so the video features are read without joining them.
+class VideoDailyRollup(Base):
+    __tablename__ = 'video_daily_rollup'
+
+    video_id = Column(Integer, primary_key=True)
+    date = Column(Integer, primary_key=True)
+    like_cnt = Column(Integer, default=0)
+    like_user_num = Column(Integer, default=0)
+    click_like_cnt = Column(Integer, default=0)
+    double_click_cnt = Column(Integer, default=0)
+    cancel_like_cnt = Column(Integer, default=0)
+    cancel_like_user_num = Column(Integer, default=0)
+    comment_cnt = Column(Integer, default=0)
+    comment_user_num = Column(Integer, default=0)
+    direct_comment_cnt = Column(Integer, default=0)
+    reply_comment_cnt = Column(Integer, default=0)
+    delete_comment_cnt = Column(Integer, default=0)
+    delete_comment_user_num = Column(Integer, default=0)
+    comment_like_cnt = Column(Integer, default=0)
+    comment_like_user_num = Column(Integer, default=0)
+    follow_cnt = Column(Integer, default=0)
+    follow_user_num = Column(Integer, default=0)
+    cancel_follow_cnt = Column(Integer, default=0)
+    cancel_follow_user_num = Column(Integer, default=0)
+    share_cnt = Column(Integer, default=0)
+    share_user_num = Column(Integer, default=0)
+    download_cnt = Column(Integer, default=0)
+    download_user_num = Column(Integer, default=0)
+    report_cnt = Column(Integer, default=0)
+    report_user_num = Column(Integer, default=0)
+    reduce_similar_cnt = Column(Integer, default=0)
+    reduce_similar_user_num = Column(Integer, default=0)
+    collect_cnt = Column(Integer, default=0)
+    collect_user_num = Column(Integer, default=0)
+    cancel_collect_cnt = Column(Integer, default=0)
+    cancel_collect_user_num = Column(Integer, default=0)
+    show_cnt = Column(Integer, default=0)
+    show_user_num = Column(Integer, default=0)
+    play_cnt = Column(Integer, default=0)
+    play_user_num = Column(Integer, default=0)
+    play_duration = Column(Integer, default=0)
+    complete_play_cnt = Column(Integer, default=0)
+    complete_play_user_num = Column(Integer, default=0)
+    valid_play_cnt = Column(Integer, default=0)
+    valid_play_user_num = Column(Integer, default=0)
+    long_time_play_cnt = Column(Integer, default=0)
+    long_time_play_user_num = Column(Integer, default=0)
+    short_time_play_cnt = Column(Integer, default=0)
+    short_time_play_user_num = Column(Integer, default=0)
+    play_progress = Column(Float, default=0.0)
+    comment_stay_duration = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index('ix_video_daily_rollup_date_brin', 'date', postgresql_using='brin'),
+    )
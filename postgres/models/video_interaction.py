@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -39,5 +39,9 @@ class VideoInteraction(Base):
     cancel_collect_cnt = Column(Integer, default=0)
     cancel_collect_user_num = Column(Integer, default=0)
 
+    __table_args__ = (
+        Index('ix_video_interaction_date_brin', 'date', postgresql_using='brin'),
+    )
+
     # Relationship to Video
     # video = relationship("Video", back_populates="interactions")
\ No newline at end of file
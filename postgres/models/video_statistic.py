@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import Column, Integer, Float, ForeignKey, Index
 from .base import Base
 from sqlalchemy.orm import relationship
 
@@ -23,5 +23,9 @@ class VideoStatistic(Base):
     play_progress = Column(Float, default=0.0)
     comment_stay_duration = Column(Integer, default=0)
 
+    __table_args__ = (
+        Index('ix_video_statistic_date_brin', 'date', postgresql_using='brin'),
+    )
+
     # Relationship to Video
     # video = relationship("Video", back_populates="statistics")
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Wall-clock and peak memory comparison of the DataPrepareFlow merge paths:
+
+- merlin: one query per split into pandas, then Dataset.merge with the user and the video
+  datasets for each split (six Dask merges), written to Parquet.
+- duckdb: one COPY splitting the interactions and joining the features, as get_datasets does.
+
+    python benchmark_merge.py [--interactions N] [user.parquet video.parquet 'user_item/*/*.parquet']
+
+Without paths, synthetic datasets shaped like the KuaiRec ones (N interactions, 5M by default)
+are written to a temporary directory. Run it where merlin is installed (the rectik image).
+Each path runs in a fresh process, so the peak RSS is its own; a path whose process is killed
+(e.g. out of memory) is reported as such.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from constant import USER_FEATURE_LIST, VIDEO_COUNT_FEATURE_LIST
+from query_string import (user_feature_query, video_feature_query, user_item_interaction_query,
+                          user_item_split_query, user_item_features_query)
+
+TRAINING_END_DATE = date(2020, 8, 28)
+VALIDATION_END_DATE = date(2020, 9, 3)
+
+
+def synthetic_datasets(root, n_users=7_176, n_videos=10_728, n_interactions=5_000_000, seed=0):
+    """User, video and Hive-partitioned user_item Parquet files shaped like the dbt exports"""
+    rng = np.random.default_rng(seed)
+    users = pd.DataFrame({"user_id": np.arange(n_users)})
+    for name in USER_FEATURE_LIST:
+        users[name] = rng.integers(0, 10, n_users)
+    videos = pd.DataFrame({"video_id": np.arange(n_videos)})
+    for name in VIDEO_COUNT_FEATURE_LIST + ["video_duration", "play_duration"]:
+        videos[name] = rng.integers(0, 100_000, n_videos)
+    interactions = pd.DataFrame({
+        "user_id": rng.integers(0, n_users, n_interactions),
+        "video_id": rng.integers(0, n_videos, n_interactions),
+        "play_duration": rng.integers(0, 100_000, n_interactions),
+        "date": pd.Timestamp("2020-07-05") + pd.to_timedelta(rng.integers(0, 62 * 86_400, n_interactions), "s"),
+    })
+
+    paths = [os.path.join(root, "user.parquet"), os.path.join(root, "video.parquet"),
+             os.path.join(root, "user_item", "*", "*.parquet")]
+    users.to_parquet(paths[0])
+    videos.to_parquet(paths[1])
+    duckdb.sql(f"COPY (SELECT *, CAST(date AS DATE) AS interaction_day FROM interactions) "
+               f"TO '{os.path.join(root, 'user_item')}' (FORMAT PARQUET, PARTITION_BY (interaction_day))")
+    return paths
+
+
+def merlin_merge(user_path, video_path, user_item_path, out):
+    """The former train_test_split + merge_{train,test,valid}_dataset steps"""
+    from merlin.io import Dataset
+
+    con = duckdb.connect(database=':memory:')
+    user_dataset = Dataset(con.execute(user_feature_query(user_path)).df())
+    video_dataset = Dataset(con.execute(video_feature_query(video_path)).df())
+    splits = {
+        "train": f"interaction_day < DATE '{TRAINING_END_DATE}'",
+        "test": f"interaction_day >= DATE '{TRAINING_END_DATE}' AND interaction_day < DATE '{VALIDATION_END_DATE}'",
+        "valid": f"interaction_day >= DATE '{VALIDATION_END_DATE}'",
+    }
+    for split, predicate in splits.items():
+        dataset = Dataset(con.execute(user_item_interaction_query(user_item_path, predicate)).df())
+        dataset = Dataset.merge(dataset, user_dataset, on='user_id', how='left')
+        dataset = Dataset.merge(dataset, video_dataset, on='video_id', how='left')
+        dataset.to_parquet(os.path.join(out, split))
+
+
+def duckdb_merge(user_path, video_path, user_item_path, out):
+    """The get_datasets step"""
+    query = user_item_features_query(
+        user_item_split_query(user_item_path, TRAINING_END_DATE, VALIDATION_END_DATE),
+        user_feature_query(user_path),
+        video_feature_query(video_path),
+    )
+    con = duckdb.connect(database=':memory:')
+    con.execute("SET enable_progress_bar = false")
+    con.execute(f"COPY ({query}) TO '{out}' (FORMAT PARQUET, PARTITION_BY (split), OVERWRITE)")
+
+
+def measure(fn, paths, out):
+    """Wall-clock seconds and peak RSS (MiB) of one merge path"""
+    start = time.perf_counter()
+    fn(*paths, out)
+    elapsed = time.perf_counter() - start
+    return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interactions", type=int, default=5_000_000,
+                        help="Interactions of the synthetic datasets")
+    parser.add_argument("paths", nargs="*", help="user.parquet video.parquet 'user_item/*/*.parquet'")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        if len(args.paths) == 3:
+            paths = args.paths
+        else:
+            print(f"Using synthetic datasets, {args.interactions:,} interactions")
+            paths = synthetic_datasets(root, n_interactions=args.interactions)
+
+        for name, fn in [("merlin (6 merges)", merlin_merge), ("duckdb (1 pass)", duckdb_merge)]:
+            out = os.path.join(root, name.split()[0])
+            # Unlike a Pool, the executor fails instead of waiting forever when its process dies
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                try:
+                    elapsed, peak = executor.submit(measure, fn, paths, out).result()
+                except BrokenProcessPool:
+                    print(f"{name:<20} killed, out of memory?")
+                    continue
+            print(f"{name:<20} {elapsed:.2f}s, peak RSS {peak:,.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,15 @@
-VIDEO_FEATURE_LIST = [
+USER_FEATURE_LIST = [
+    "onehot_feat0", "onehot_feat1", "onehot_feat2", "onehot_feat3", 
+    "onehot_feat5", "onehot_feat6", "onehot_feat7", "onehot_feat8", 
+    "onehot_feat9", "onehot_feat10", "onehot_feat11", "onehot_feat4",
+    "onehot_feat12", "onehot_feat13", "onehot_feat14", "onehot_feat15", 
+    "onehot_feat16", "onehot_feat17",
+    "is_lowactive_period", "is_live_streamer", "is_video_author",
+    "follow_user_num_range", "fans_user_num_range", "friend_user_num_range", 
+    "register_days_range"
+]
+
+VIDEO_COUNT_FEATURE_LIST = [
     "like_cnt", "click_like_cnt", "double_click_cnt", "cancel_like_cnt", 
     "comment_cnt", "direct_comment_cnt", "reply_comment_cnt", 
     "delete_comment_cnt", "comment_like_cnt", "follow_cnt", 
@@ -8,5 +19,11 @@ VIDEO_FEATURE_LIST = [
     "complete_play_cnt", "complete_play_user_num", "valid_play_cnt", 
     "valid_play_user_num", "long_time_play_cnt", "long_time_play_user_num", 
     "short_time_play_cnt", "short_time_play_user_num", 
-    "comment_stay_duration", "video_duration", "total_play_duration"
-]
\ No newline at end of file
+    "comment_stay_duration"
+]
+
+VIDEO_DURATION_FEATURE_LIST = ["video_duration", "total_play_duration"]
+
+VIDEO_FEATURE_LIST = VIDEO_COUNT_FEATURE_LIST + VIDEO_DURATION_FEATURE_LIST
+
+INTERACTION_FEATURE_LIST = ["play_duration"]
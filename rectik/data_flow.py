@@ -1,5 +1,7 @@
 from metaflow import FlowSpec, step, batch, Parameter, current
+from contextlib import contextmanager
 from datetime import datetime
+import threading
 from decorators import magicdir
 
 class DataPrepareFlow(FlowSpec):
@@ -32,11 +34,11 @@ class DataPrepareFlow(FlowSpec):
         default="/rectik/data/video.parquet"
     )
 
-    # Parameter: Path to the user-item interaction dataset file (parquet format).
+    # Parameter: Path to the user-item interaction dataset (parquet files partitioned by interaction day).
     USER_VIDEO_DATASET_PATH = Parameter(
         name="user_video_dataset_path",
-        help="Path to video parquet file.",
-        default="/rectik/data/user_item.parquet"
+        help="Path (glob) to the user-item interaction parquet files, Hive-partitioned by interaction_day.",
+        default="/rectik/data/user_item/*/*.parquet"
     )
 
     # Parameter: Date up to which data is used for training (yyyy-mm-dd format).
@@ -53,6 +55,26 @@ class DataPrepareFlow(FlowSpec):
         default='2020-09-03'
     )
 
+    # Parameters: Out-of-core processing of the merged datasets with Dask.
+    PART_SIZE = Parameter(
+        name="part_size",
+        help="Size of the Dask partitions the datasets are read in, e.g. '256MB'. Default lets Merlin pick one",
+        default="",
+    )
+
+    DASK_SCHEDULER = Parameter(
+        name="dask_scheduler",
+        help="Dask cluster the workflow runs on: empty for the default in-process scheduler, 'local' to start "
+             "a LocalCluster, or a scheduler address such as tcp://localhost:8786",
+        default="",
+    )
+
+    DASK_WORKERS = Parameter(
+        name="dask_workers",
+        help="Number of workers of the LocalCluster, used with dask_scheduler=local",
+        default=4,
+    )
+
     FEATURE_REPO_PATH = Parameter(
         name="feature_repo_path",
         help="The feature store repository directory.",
@@ -93,319 +115,218 @@ class DataPrepareFlow(FlowSpec):
         assert self.validation_end_date > self.training_end_date, "Validation date must be later than training date"
         print(f"Training End Date: {self.TRAINING_END_DATE} | Validation End Date: {self.VALIDATION_END_DATE}")
         
-        # Proceed to the next step to fetch the user dataset
-        self.next(self.get_user_dataset)
-
-    @step
-    def get_user_dataset(self):
-        """
-        Fetch the user dataset using DuckDB and log the result.
-        Runs a query defined by USER_FEATURE_QUERY.
-        """
-        import os
-        import duckdb
-        from query_string import USER_FEATURE_QUERY
-
-        # Format the query string and execute it
-        query = USER_FEATURE_QUERY.format(self.USER_DATASET_PATH, "")
-        print(f"Fetching user dataset with query:\n{query}")
-
-        con = duckdb.connect(database=':memory:')
-        self.user_df = con.execute(query).df()
-
-        # Log the number of rows fetched and display a sample
-        print(f"Fetched {len(self.user_df)} rows from user dataset.")    
-
-        # Proceed to the next step to fetch the video dataset
-        self.next(self.get_video_dataset)
+        # Proceed to the next step to fetch the datasets
+        self.next(self.get_datasets)
 
+    @magicdir
     @step
-    def get_video_dataset(self):
+    def get_datasets(self):
         """
-        Fetch the video dataset using DuckDB and log the result.
-        Runs a query defined by VIDEO_FEATURES_QUERY.
+        Build the train, test and validation datasets in one DuckDB pass, applying sampling to the
+        interactions if specified.
+        The interactions are split by date and joined with the user and video features inside
+        DuckDB: a single COPY ... PARTITION_BY writes the three merged Parquet datasets, the rows
+        never go through pandas nor a Dask merge.
+        Results are written under PROCESSED_DATA_DIR/staging/<run id>, the artifacts are ParquetRefs
+        to them instead of pickled DataFrames or Datasets. Every run writes its own directory, so the
+        refs of an earlier run (or of the run being resumed) never see the rows of another one.
         """
         import os
+        import time
         import duckdb
-        from query_string import VIDEO_FEATURES_QUERY
-
-        # Format and execute the query for fetching video data
-        query = VIDEO_FEATURES_QUERY.format(self.VIDEO_DATASET_PATH, "")
-        print(f"Fetching video dataset with query:\n{query}")
-
-        con = duckdb.connect(database=':memory:')
-        self.video_df = con.execute(query).df()
-
-        # Log the number of rows fetched and display a sample
-        print(f"Fetched {len(self.video_df)} rows from video dataset.")
-    
-
-        # Proceed to the next step to fetch the user-video interaction dataset
-        self.next(self.get_user_video_dataset)
-
-    @step
-    def get_user_video_dataset(self):
-        """
-        Fetch the user-item interaction dataset, applying sampling if specified.
-        Runs a query defined by USER_ITEM_INTERACTION_QUERY.
-        """
-        import duckdb
-        from query_string import USER_ITEM_INTERACTION_QUERY
+        from parquet_ref import ParquetRef
+        from query_string import (user_feature_query, video_feature_query, user_item_split_query,
+                                  user_item_features_query)
 
         # Apply sampling if ROW_SAMPLING is non-zero
         _sampling = int(self.ROW_SAMPLING)
         sampling_expression = '' if _sampling == 0 else f'USING SAMPLE {_sampling} PERCENT (bernoulli)'
 
-        query = USER_ITEM_INTERACTION_QUERY.format(self.USER_VIDEO_DATASET_PATH, sampling_expression)
-        print(f"Fetching user-item interaction dataset with query:\n{query}")
-
-        con = duckdb.connect(database=':memory:')
-        self.user_video_df = con.execute(query).df()
-
-        # Log the number of rows fetched and display a sample
-        print(f"Fetched {len(self.user_video_df)} rows from user-item interaction dataset.")
-        print(self.user_video_df.head())
-
-        # Proceed to the next step to split the datasets for training, testing, and validation
-        self.next(self.train_test_split)
-
-    @magicdir
-    @step 
-    def train_test_split(self):
-        """
-        Split the user-item interaction dataset into train, test, and validation sets based on interaction date.
-        Converts dates to datetime objects for filtering.
-        """        
-        import pandas as pd
-        from merlin.io import Dataset
-
-        # Ensure the interaction_date column is in datetime format for filtering
-        self.user_video_df['interaction_date'] = pd.to_datetime(self.user_video_df['interaction_date'])
-        
-        # Split data based on interaction_date for training, testing, and validation
-        self.train_df = self.user_video_df[self.user_video_df['interaction_date'] < self.training_end_date]
-        self.test_df = self.user_video_df[
-            (self.user_video_df['interaction_date'] >= self.training_end_date) &
-            (self.user_video_df['interaction_date'] < self.validation_end_date)
-        ]
-        self.valid_df = self.user_video_df[self.user_video_df['interaction_date'] >= self.validation_end_date]
-
-        # Convert user and video datasets to Merlin Dataset format
-        self.user_dataset = Dataset(self.user_df)
-        self.video_dataset = Dataset(self.video_df)
-
-        # Proceed to the next step to merge the datasets
-        self.next(self.merge_train_dataset)
-
-    @step
-    def merge_train_dataset(self):
-        """
-        Merge the training dataset with user and video features based on user_id and video_id.
-        """
-        from merlin.io import Dataset
-
-        print("User dataframe columns: ", self.user_df.columns)
-        print("Video dataframe columns: ", self.video_df.columns)
-
-        print("Merging datasets for training...")
-
-        # Convert the train dataset into Merlin's Dataset format
-        train_dataset = Dataset(self.train_df)
-
-        # Merge user and video features into the training dataset
-        train_dataset = Dataset.merge(train_dataset, self.user_dataset, on='user_id', how='left')
-        train_dataset = Dataset.merge(train_dataset, self.video_dataset, on='video_id', how='left')
-
-        # Log the result of the merge
-        print(f"Merged dataset with {train_dataset.num_rows} rows.")
-        print(f"Example head: ", train_dataset.head())
-        self.train_dataset = train_dataset
-
-        # Proceed to the next step to merge the test datasets
-        self.next(self.merge_test_dataset)
-
-    @step
-    def merge_test_dataset(self):
-        """
-        Merge the test dataset with user and video features based on user_id and video_id.
-        """
-        from merlin.io import Dataset
-
-        print("Merging datasets for testing...")
-
-        # Convert the test dataset into Merlin's Dataset format
-        test_dataset = Dataset(self.test_df)
-
-        # Merge user and video features into the test dataset
-        test_dataset = Dataset.merge(test_dataset, self.user_dataset, on='user_id', how='left')
-        test_dataset = Dataset.merge(test_dataset, self.video_dataset, on='video_id', how='left')
-
-        # Log the result of the merge
-        print(f"Merged dataset with {test_dataset.num_rows} rows.")
-        print(f"Example head: ", test_dataset.head())
-        self.test_dataset = test_dataset
-
-        # Proceed to the next step to merge the validation datasets
-        self.next(self.merge_valid_dataset)
-
-    @step
-    def merge_valid_dataset(self):
-        """
-        Merge the validation dataset with user and video features based on user_id and video_id.
-        """
-        from merlin.io import Dataset
-
-        print("Merging datasets for validation...")
-
-        # Convert the validation dataset into Merlin's Dataset format
-        valid_dataset = Dataset(self.valid_df)
-
-        # Merge user and video features into the validation dataset
-        valid_dataset = Dataset.merge(valid_dataset, self.user_dataset, on='user_id', how='left')
-        valid_dataset = Dataset.merge(valid_dataset, self.video_dataset, on='video_id', how='left')
-
-        # Log the result of the merge
-        print(f"Merged dataset with {valid_dataset.num_rows} rows.")
-        print(f"Example head: ", valid_dataset.head())
-        self.valid_dataset = valid_dataset
-
-        # Proceed to the final step to save the processed datasets
-        self.next(self.build_workflow)
-
+        query = user_item_features_query(
+            user_item_split_query(self.USER_VIDEO_DATASET_PATH, self.training_end_date,
+                                  self.validation_end_date, sampling_expression),
+            user_feature_query(self.USER_DATASET_PATH),
+            video_feature_query(self.VIDEO_DATASET_PATH),
+        )
 
-    @step
-    def build_workflow(self):
-        """
-        Build the NVTabular workflow by combining user, video, and interaction workflows
-        """
-        from nvtabular import ops
-        from workflows import outputs
+        staging_dir = os.path.join(self.PROCESSED_DATA_DIR, "staging", current.run_id)
+        os.makedirs(staging_dir, exist_ok=True)
+        # One directory per split, split=train/, split=test/ and split=valid/
+        merged_dir = os.path.join(staging_dir, "merged")
 
-        print("Building NVTabular workflow...")
-        self.workflow = (interaction_workflow + user_workflow + video_workflow) >> ops.Dropna()
+        print(f"Splitting and merging user-item interactions with query:\n{query}")
+        start = time.perf_counter()
+        con = duckdb.connect(database=':memory:')
+        con.execute(f"COPY ({query}) TO '{merged_dir}' (FORMAT PARQUET, PARTITION_BY (split), OVERWRITE)")
+        print(f"Merged datasets written in {time.perf_counter() - start:.1f}s.")
+        con.close()
 
-        self.next(self.fit_train_workflow)
+        for split in ['train', 'test', 'valid']:
+            path = os.path.join(merged_dir, f"split={split}")
+            assert os.path.isdir(path), f"No interactions in the {split} split, check the training and validation end dates"
+            dataset = ParquetRef(path)
+            setattr(self, f'{split}_dataset', dataset)
+            print(f"Merged {split} dataset: {dataset}")
 
+        # Proceed to the next step to fit the workflow and transform the datasets
+        self.next(self.transform_datasets)
 
     @magicdir
     @step
-    def fit_train_workflow(self):
+    def transform_datasets(self):
         """
-        Fit the NVTabular workflow and transform the data
+        Fit the NVTabular workflow on the train dataset once, then transform the train, test and
+        validation datasets with it in the same Dask session. The transformed datasets go straight
+        to Parquet and the fitted workflow is only saved to PROCESSED_DATA_DIR/workflow, it is not
+        kept as an artifact.
+        The datasets are read in partitions of PART_SIZE, with DASK_SCHEDULER set they are processed
+        partition-parallel on a Dask cluster. The peak memory of each worker during the step is
+        reported, or the step's own without a cluster.
         """
         import os
         import nvtabular as nvt
+        from parquet_ref import ParquetRef
+        from workflows import outputs
 
-        print("Fitting the workflow on train dataset...")
-        self.fitted_workflow = nvt.Workflow(self.workflow).fit(self.train_dataset)
-        self.fitted_workflow.save(os.path.join(self.PROCESSED_DATA_DIR, "workflow"))
-
-        # Log the result of the transformation
-        print(f"Succesfully fit the workflow on train dataset.")
+        client, cluster = self.dask_client()
+        part_size = self.PART_SIZE or None
+
+        try:
+            with self.sample_memory(client) as peaks:
+                print("Fitting the workflow on train dataset...")
+                workflow = nvt.Workflow(outputs)
+                workflow.fit(self.train_dataset.to_merlin(part_size=part_size))
+                workflow.save(os.path.join(self.PROCESSED_DATA_DIR, "workflow"))
+                print(f"Succesfully fit the workflow on train dataset.")
+
+                for split in ['train', 'test', 'valid']:
+                    print(f"Transforming the {split} dataset...")
+                    path = os.path.join(self.PROCESSED_DATA_DIR, split)
+                    dataset = getattr(self, f'{split}_dataset').to_merlin(part_size=part_size)
+                    print(f"{split} dataset: {dataset.npartitions} partitions")
+                    workflow.transform(dataset).to_parquet(path)
+                    print(f"Data transformed and saved to {path}.")
+        finally:
+            if client is not None:
+                client.close()
+            if cluster is not None:
+                cluster.close()
+
+        for worker, peak in sorted(peaks.items()):
+            print(f"Worker {worker}: peak memory {peak / 2**20:,.0f} MiB")
+
+        # Reference to the transformed train dataset on disk
+        self.train_features = ParquetRef(os.path.join(self.PROCESSED_DATA_DIR, "train"))
+        print("Schema: ", self.train_features.schema)
 
-        self.next(self.transform_train_workflow)
+        self.next(self.extract_user_item_features)
 
-    @magicdir
-    @step
-    def transform_train_workflow(self):
+    def dask_client(self):
         """
-        Transform the NVTabular workflow 
+        Client of the cluster set by DASK_SCHEDULER, registered as the default one so the workflow
+        computations run on it, and the LocalCluster the step started if any. No client keeps the
+        in-process scheduler.
         """
-        import os
+        if not self.DASK_SCHEDULER:
+            return None, None
 
-        print("Transforming the workflow on train dataset...")
-        self.train_features = self.fitted_workflow.transform(self.train_dataset)
-        self.train_features.to_parquet(
-                os.path.join(self.PROCESSED_DATA_DIR, "train")
-        )
-
-        print("Schema: ", self.train_features.to_ddf().dtypes)
-
-        # Log the result of the transformation
-        print(f"Data transformed and saved to parquet. ")
+        from dask.distributed import Client, LocalCluster
 
-        self.next(self.transform_test_workflow)
-
-
-    @magicdir
-    @step
-    def transform_test_workflow(self):
+        if self.DASK_SCHEDULER == 'local':
+            cluster = LocalCluster(n_workers=int(self.DASK_WORKERS), threads_per_worker=1)
+            client = Client(cluster)
+        else:
+            cluster = None
+            client = Client(self.DASK_SCHEDULER)
+        print(f"Using Dask cluster {client.dashboard_link} with {len(client.scheduler_info()['workers'])} workers")
+        return client, cluster
+
+    @staticmethod
+    @contextmanager
+    def sample_memory(client, interval=0.5):
         """
-        Transform the NVTabular workflow 
+        Peak memory of each Dask worker while the block runs, {worker: bytes}, filled when it exits.
+        Without a client the computations run in the step process, its own peak is reported. The
+        workers of a cluster outlive the run, so their memory is sampled from the scheduler's
+        heartbeat metrics every `interval` seconds instead of read from their lifetime peak.
         """
-        import os
-
-        print("Transforming the workflow on test dataset...")
-        self.fitted_workflow.transform(self.train_dataset).to_parquet(
-                os.path.join(self.PROCESSED_DATA_DIR, "test")
-        )
-
-        # Log the result of the transformation
-        print(f"Data transformed and saved to parquet. ")
-
-        self.next(self.transform_valid_workflow)
-
+        peaks = {}
+        if client is None:
+            import resource
+
+            yield peaks
+            # KiB on Linux
+            peaks["in-process"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+            return
+
+        done = threading.Event()
+
+        def sample():
+            while True:
+                for worker, info in client.scheduler_info()["workers"].items():
+                    peaks[worker] = max(peaks.get(worker, 0), info["metrics"]["memory"])
+                if done.wait(interval):
+                    return
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        try:
+            yield peaks
+        finally:
+            done.set()
+            sampler.join()
 
     @magicdir
     @step
-    def transform_valid_workflow(self):
+    def extract_user_item_features(self):
         """
-        Fit the NVTabular workflow and transform the data
+        Extract user item features from transformed train dataset.
+        The features are encoded by the fitted workflow and stamped with the end of the training data.
+        Only the users and videos that are new or whose raw features changed since the previous run
+        are appended to the feature files, unless the refit workflow encodes the others differently,
+        then the whole files are rewritten.
         """
         import os
+        import pyarrow.compute as pc
+        from nvtabular import Workflow
+        from merlin.io import Dataset
+        from constant import USER_FEATURE_LIST, VIDEO_FEATURE_LIST
+        from feature_delta import update_feature_file
 
-        print("Transforming the workflow on valid dataset...")
-        self.fitted_workflow.transform(self.train_dataset).to_parquet(
-                os.path.join(self.PROCESSED_DATA_DIR, "valid")
-        )
+        # Event time of the features: the last interaction they were computed from
+        event_time = pc.max(self.train_dataset.to_arrow(['interaction_date'])['interaction_date']).as_py()
+        print(f"Features as of {event_time}")
 
-        # Log the result of the transformation
-        print(f"Data transformed and saved to parquet. ")
+        workflow = Workflow.load(os.path.join(self.PROCESSED_DATA_DIR, "workflow"))
 
-        self.next(self.extract_user_item_features)
+        def encoder(name):
+            subworkflow = workflow.get_subworkflow(name)
+            return lambda df: subworkflow.transform(Dataset(df)).to_ddf().compute().reset_index(drop=True)
 
-    @magicdir
-    @step
-    def extract_user_item_features(self):
-        """
-        Extract user item features from transformed train dataset.
-        """
-        import os
-        from merlin.schema.tags import Tags
-        from merlin.models.utils.dataset import unique_rows_by_features
+        def raw_features(key, columns):
+            # One row per entity of the untransformed train dataset, with its raw id
+            df = self.train_dataset.to_arrow([key] + columns).to_pandas()
+            return df.drop_duplicates(key, keep="last").sort_values(key).reset_index(drop=True)
 
         print("Extracting user features...")
-        
-        user_features = (
-            unique_rows_by_features(self.train_features, Tags.USER, Tags.USER_ID)
-            .compute()
-            .reset_index(drop=True)
-        )
-
-        user_features["datetime"] = datetime.now()
-        user_features["datetime"] = user_features["datetime"].astype("datetime64[ns]")
-        user_features["created"] = datetime.now()
-        user_features["created"] = user_features["created"].astype("datetime64[ns]")
-
+        user_features = raw_features("user_id", USER_FEATURE_LIST)
         user_features_path = os.path.join(self.FEATURE_REPO_PATH, "data", "user_features.parquet")
-        user_features.to_parquet(user_features_path)
-        print(f"User features saved to {user_features_path}")
+        changed, rewritten = update_feature_file(user_features_path, user_features, "user_id", event_time,
+                                                 encoder("user"))
+        if rewritten:
+            print(f"User features saved to {user_features_path}: encoding changed, {changed} users rewritten")
+        else:
+            print(f"User features saved to {user_features_path}: {changed} of {len(user_features)} users new or changed")
         
         # Extract unique item features
-        video_features = (
-            unique_rows_by_features(self.train_features, Tags.ITEM, Tags.ITEM_ID)
-            .compute()
-            .reset_index(drop=True)
-        )
-
-        video_features["datetime"] = datetime.now()
-        video_features["datetime"] = video_features["datetime"].astype("datetime64[ns]")
-        video_features["created"] = datetime.now()
-        video_features["created"] = video_features["created"].astype("datetime64[ns]")
-
+        video_features = raw_features("video_id", VIDEO_FEATURE_LIST)
         video_df_path = os.path.join(self.FEATURE_REPO_PATH, "data", "video_features.parquet")
-        video_features.to_parquet(video_df_path)
-        print("Video Features stored at the path: ", video_df_path)
+        changed, rewritten = update_feature_file(video_df_path, video_features, "video_id", event_time,
+                                                 encoder("video"))
+        if rewritten:
+            print(f"Video Features stored at the path: {video_df_path}: encoding changed, {changed} videos rewritten")
+        else:
+            print(f"Video Features stored at the path: {video_df_path}: {changed} of {len(video_features)} videos new or changed")
 
         # Log the result of the transformation
         self.next(self.end)
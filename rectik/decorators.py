@@ -1,21 +1,110 @@
+import hashlib
+import os
 from functools import wraps
 
 magic_dir = 'merlin'
 
+
+def file_digest(path):
+    # sha1 of the content, the key the flow's content-addressed store files it under
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def scan(root, previous):
+    """
+    Manifest of the files under root, {relative path: {key, size, mtime_ns}}.
+    Files whose size and mtime match the previous manifest keep their key without being read.
+    """
+    manifest = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            rel = os.path.relpath(path, root)
+            st = os.stat(path)
+            entry = previous.get(rel)
+            if entry is None or entry['size'] != st.st_size or entry['mtime_ns'] != st.st_mtime_ns:
+                entry = {'key': file_digest(path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            manifest[rel] = entry
+    return manifest
+
+
+def store(datastore, root, manifest, previous):
+    """
+    Upload the files whose content the previous manifest does not reference, returns the
+    number of bytes read. The store itself skips the blobs it already holds.
+    """
+    known = {entry['key'] for entry in previous.values()}
+    new = {entry['key']: rel for rel, entry in manifest.items() if entry['key'] not in known}
+
+    def blobs():
+        for rel in new.values():
+            with open(os.path.join(root, rel), 'rb') as f:
+                yield f.read()
+
+    for key, (_, saved) in zip(new, datastore.save_data(blobs(), len_hint=len(new))):
+        if saved != key:
+            raise RuntimeError(f"magicdir: {new[key]} changed while it was stored")
+    return sum(manifest[rel]['size'] for rel in new.values())
+
+
+def restore(datastore, root, manifest):
+    """
+    Make root match the manifest, downloading only the files that differ from it.
+    """
+    current = scan(root, manifest) if os.path.isdir(root) else {}
+    for rel in current.keys() - manifest.keys():
+        os.remove(os.path.join(root, rel))
+    missing = {rel: entry for rel, entry in manifest.items()
+               if current.get(rel, {}).get('key') != entry['key']}
+    if not missing:
+        return 0
+
+    keys = {entry['key'] for entry in missing.values()}
+    try:
+        blobs = dict(datastore.load_data(keys))
+    except Exception as e:
+        raise RuntimeError(f"magicdir: could not load {len(keys)} files of {magic_dir} from the datastore "
+                           f"({e}). Was the datastore of the previous steps cleaned up?") from e
+    if keys - blobs.keys():
+        raise RuntimeError(f"magicdir: {len(keys - blobs.keys())} files of {magic_dir} are missing from "
+                           "the datastore. Was the datastore of the previous steps cleaned up?")
+
+    for rel, entry in missing.items():
+        path = os.path.join(root, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(blobs[entry['key']])
+        # Keep the recorded mtime, so the next scan trusts the file without hashing it
+        os.utime(path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+    return len(missing)
+
+
 def magicdir(f):
+    """
+    Carry the `merlin` directory across steps. The artifact is a manifest of file keys, the
+    content lives in the flow's content-addressed datastore next to the other artifacts, so
+    resume and remote steps find it: a step only uploads the files it changed, and restoring
+    only downloads the files that differ from the working directory.
+    The files go through FlowDataStore.save_data / load_data, reached from the step's task
+    datastore (`self._datastore.parent_datastore`), checked against Metaflow 2.19.39.
+    """
     artifact = 'magicdir'
     @wraps(f)
     def func(self):
-        from io import BytesIO
-        from tarfile import TarFile
+        datastore = self._datastore.parent_datastore
         existing = getattr(self, artifact, None)
         if existing:
-            buf = BytesIO(existing)
-            with TarFile(mode='r', fileobj=buf) as tar:
-                tar.extractall()
+            restored = restore(datastore, magic_dir, existing)
+            if restored:
+                print(f"magicdir: restored {restored} of {len(existing)} files")
         f(self)
-        buf = BytesIO()
-        with TarFile(mode='w', fileobj=buf) as tar:
-            tar.add(magic_dir)
-        setattr(self, artifact, buf.getvalue())
-    return func
\ No newline at end of file
+        manifest = scan(magic_dir, existing or {})
+        uploaded = store(datastore, magic_dir, manifest, existing or {})
+        if manifest != existing:
+            print(f"magicdir: {len(manifest)} files, {uploaded / 2**20:,.1f} MiB stored")
+            setattr(self, artifact, manifest)
+    return func
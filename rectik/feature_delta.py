@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd
+
+# Timestamp columns of the Feast file sources, not features
+TIMESTAMP_COLUMNS = ["datetime", "created"]
+
+
+def changed_rows(current, previous, key):
+    """Rows of `current` whose key is not in `previous`, or whose feature values differ from it."""
+    if previous is None or previous.empty:
+        return current
+
+    columns = [c for c in current.columns if c in previous.columns and c != key and c not in TIMESTAMP_COLUMNS]
+    merged = current[[key] + columns].merge(previous[[key] + columns], on=key, how="left",
+                                            suffixes=("", "_previous"), indicator=True)
+
+    changed = merged["_merge"] == "left_only"
+    for column in columns:
+        new, old = merged[column], merged[f"{column}_previous"]
+        changed |= new.ne(old) & ~(new.isna() & old.isna())
+    return current[changed.to_numpy()]
+
+
+def update_feature_file(path, raw_features, key, event_time, encode):
+    """
+    Update the feature file at `path` with the features of this run, stamped with `event_time`
+    (when the data they come from ends). Returns the number of rows written and whether the
+    whole file was rewritten.
+
+    `raw_features` holds the raw ids and untransformed values, one row per entity, and `encode`
+    maps them, in order, to the rows of the feature file (the fitted workflow). Every row keeps
+    its raw id in `<key>_raw`, since the encoded id depends on the fit.
+    - If every entity whose raw features did not change (compared with the snapshot kept in
+      `<name>_raw.parquet`) is still encoded as the file has it, only the new and changed
+      entities are appended, so Feast materializes the delta only.
+    - Otherwise the workflow was refit to a different encoding: the file is rewritten with the
+      current encoding of every entity, so Feast never serves rows of an older fit.
+    The written rows also go to `<name>_delta.parquet` for the consumers that refresh per entity.
+    Appended files keep the earlier rows of the changed entities, they are only dropped when the
+    file is rewritten.
+    """
+    raw_key = f"{key}_raw"
+    raw_path = path.replace(".parquet", "_raw.parquet")
+    encoded = encode(raw_features)
+    encoded[raw_key] = raw_features[key].to_numpy()
+
+    previous = pd.read_parquet(path) if os.path.exists(path) else None
+    rewrite = previous is None or raw_key not in previous.columns or not os.path.exists(raw_path)
+    if not rewrite:
+        changed = changed_rows(raw_features, pd.read_parquet(raw_path), key)[key]
+        latest = previous.sort_values(TIMESTAMP_COLUMNS).drop_duplicates(raw_key, keep="last")
+        unchanged = encoded[~encoded[raw_key].isin(changed)]
+        rewrite = not changed_rows(unchanged, latest, raw_key).empty
+
+    delta = encoded if rewrite else encoded[encoded[raw_key].isin(changed)].reset_index(drop=True)
+    delta["datetime"] = pd.Timestamp(event_time)
+    delta["datetime"] = delta["datetime"].astype("datetime64[ns]")
+    delta["created"] = pd.Timestamp.now()
+    delta["created"] = delta["created"].astype("datetime64[ns]")
+
+    delta.to_parquet(path.replace(".parquet", "_delta.parquet"))
+    history = delta if rewrite else pd.concat([previous, delta], ignore_index=True)
+    history.to_parquet(path)
+    raw_features.to_parquet(raw_path)
+    return len(delta), rewrite
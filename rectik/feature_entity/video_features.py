@@ -4,6 +4,8 @@ from feast.types import Int32, Float32
 from feast.infra.offline_stores.file_source import FileSource
 
 # Define the source of video features
+# Written by DataPrepareFlow.extract_user_item_features: the video_daily_rollup columns of
+# video.parquet after the NVTabular workflow, which encodes them the way the model expects
 video_features_source = FileSource(
     path="/rectik/feast_repo/feature_repo/data/video_features.parquet",
     timestamp_field="datetime",
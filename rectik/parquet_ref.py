@@ -0,0 +1,34 @@
+import pyarrow.dataset as ds
+
+
+class ParquetRef:
+    """
+    Artifact standing for a Parquet dataset (a file or a directory of files) written by a step.
+    Only the path, the Arrow schema, the file list and the row count are pickled, the data is
+    opened lazily by the step that needs it.
+    """
+    def __init__(self, path):
+        self.path = path
+        # Parquet files only: NVTabular writes schema.pbtxt and _metadata files alongside them
+        dataset = ds.dataset(path, format="parquet", partitioning="hive", exclude_invalid_files=True)
+        self.files = dataset.files
+        self.schema = dataset.schema
+        self.num_rows = dataset.count_rows()
+
+    def __repr__(self):
+        return f"ParquetRef({self.path!r}, {self.num_rows} rows, {len(self.schema)} columns)"
+
+    def to_arrow(self, columns=None):
+        """Read the dataset, or some of its columns, as an Arrow table."""
+        return ds.dataset(self.files, schema=self.schema, format="parquet").to_table(columns=columns)
+
+    def to_dask(self, **kwargs):
+        import dask.dataframe as dd
+
+        return dd.read_parquet(self.files, **kwargs)
+
+    def to_merlin(self, **kwargs):
+        """Open the dataset as a merlin.io.Dataset, with the schema.pbtxt written next to it if any."""
+        from merlin.io import Dataset
+
+        return Dataset(self.path, engine="parquet", **kwargs)
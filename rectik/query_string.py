@@ -1,102 +1,68 @@
-VIDEO_FEATURES_QUERY = """
-SELECT 
-    video_id, 
-    author_id, 
-    upload_dt, 
-    visible_status, 
-    video_duration, 
-    video_width, 
-    video_height, 
-    manual_cover_text, 
-    caption, 
-    topic_tag_cleaned, 
-    date as statistic_date, 
-    like_cnt, 
-    click_like_cnt, 
-    double_click_cnt, 
-    cancel_like_cnt, 
-    comment_cnt, 
-    direct_comment_cnt, 
-    reply_comment_cnt, 
-    delete_comment_cnt, 
-    comment_like_cnt, 
-    follow_cnt, 
-    cancel_follow_cnt, 
-    share_cnt, 
-    download_cnt, 
-    report_cnt, 
-    reduce_similar_cnt, 
-    collect_cnt, 
-    cancel_collect_cnt, 
-    show_cnt, 
-    show_user_num, 
-    play_cnt, 
-    play_user_num, 
-    play_duration as total_play_duration, 
-    complete_play_cnt, 
-    complete_play_user_num, 
-    valid_play_cnt, 
-    valid_play_user_num, 
-    long_time_play_cnt, 
-    long_time_play_user_num, 
-    short_time_play_cnt, 
-    short_time_play_user_num, 
-    play_progress, 
-    comment_stay_duration
-FROM
-    read_parquet('{}')               -- Parquet data file
-    {}                               -- Sampling method
-ORDER BY
-    video_id ASC
 """
+DuckDB queries of DataPrepareFlow, built from the column lists the NVTabular workflow uses
+(constant.py), so only those columns are read from the Parquet files.
+The queries have no ORDER BY: the rows are joined and shuffled afterwards, a global sort
+of each file would be thrown away.
+"""
+from constant import USER_FEATURE_LIST, VIDEO_FEATURE_LIST, INTERACTION_FEATURE_LIST
 
+# Output column -> column of the Parquet file it is read from
+VIDEO_COLUMN_SOURCES = {"total_play_duration": "play_duration"}
+INTERACTION_COLUMN_SOURCES = {"interaction_date": "date"}
 
 
-USER_FEATURE_QUERY = """
-SELECT 
-    user_id, 
-    onehot_feat0, 
-    onehot_feat1, 
-    onehot_feat2, 
-    onehot_feat3, 
-    onehot_feat4, 
-    onehot_feat5, 
-    onehot_feat6, 
-    onehot_feat7, 
-    onehot_feat8, 
-    onehot_feat9, 
-    onehot_feat10, 
-    onehot_feat11, 
-    onehot_feat12, 
-    onehot_feat13, 
-    onehot_feat14, 
-    onehot_feat15, 
-    onehot_feat16, 
-    onehot_feat17, 
-    is_lowactive_period, 
-    is_live_streamer, 
-    is_video_author, 
-    follow_user_num_range, 
-    fans_user_num_range, 
-    friend_user_num_range, 
-    register_days_range
-FROM
-    read_parquet('{}')               -- Parquet data file
-    {}                               -- Sampling method
-ORDER BY
-    user_id ASC
-"""
+def select_query(path, columns, sources=None, where=None, sampling="", hive_partitioning=False):
+    """
+    Select `columns` from the Parquet file(s) at `path`. DuckDB pushes the projection and the
+    `where` predicate into the Parquet scan, skipping the other columns, and the row groups and
+    Hive partitions the predicate excludes.
+    """
+    sources = sources or {}
+    projection = ",\n    ".join(
+        f"{sources[column]} AS {column}" if column in sources else column for column in columns
+    )
+    options = ", hive_partitioning = true" if hive_partitioning else ""
+    query = f"SELECT\n    {projection}\nFROM\n    read_parquet('{path}'{options})"
+    if where:
+        query += f"\nWHERE\n    {where}"
+    if sampling:
+        # DuckDB only accepts the sample clause after WHERE
+        query += f"\n{sampling}"
+    return query
+
+
+def user_feature_query(path, sampling=""):
+    return select_query(path, ["user_id"] + USER_FEATURE_LIST, sampling=sampling)
+
+
+def video_feature_query(path, sampling=""):
+    return select_query(path, ["video_id"] + VIDEO_FEATURE_LIST, VIDEO_COLUMN_SOURCES, sampling=sampling)
+
+
+def user_item_interaction_query(path, where=None, sampling=""):
+    """Interactions of the Hive-partitioned user_item dataset, `where` prunes its interaction_day partitions."""
+    return select_query(path, ["user_id", "video_id"] + INTERACTION_FEATURE_LIST + ["interaction_date"],
+                        INTERACTION_COLUMN_SOURCES, where=where, sampling=sampling, hive_partitioning=True)
+
+
+def user_item_split_query(path, training_end, validation_end, sampling=""):
+    """
+    Interactions with a `split` column (train, test or valid) from their interaction_day, in a
+    single scan of the user_item dataset. The end dates are `datetime.date` or `datetime`.
+    """
+    split = (f"CASE WHEN interaction_day < DATE '{training_end:%Y-%m-%d}' THEN 'train' "
+             f"WHEN interaction_day < DATE '{validation_end:%Y-%m-%d}' THEN 'test' "
+             f"ELSE 'valid' END")
+    return select_query(path, ["user_id", "video_id"] + INTERACTION_FEATURE_LIST + ["interaction_date", "split"],
+                        {**INTERACTION_COLUMN_SOURCES, "split": split}, sampling=sampling, hive_partitioning=True)
 
 
-USER_ITEM_INTERACTION_QUERY = """
-SELECT 
-    user_id, 
-    video_id, 
-    play_duration, 
-    date as interaction_date
-FROM
-    read_parquet('{}')               -- Parquet data file
-    {}                               -- Sampling method
-ORDER BY
-    user_id, date ASC
-"""
\ No newline at end of file
+def user_item_features_query(interaction_query, user_query, video_query):
+    """
+    Interactions with their user and video features, in one pass: the user and video tables are
+    small, DuckDB builds the hash tables of the joins from them and streams the interactions.
+    """
+    return (f"SELECT\n    i.*,\n    u.* EXCLUDE (user_id),\n    v.* EXCLUDE (video_id)\n"
+            f"FROM ({interaction_query}) AS i\n"
+            f"LEFT JOIN ({user_query}) AS u ON i.user_id = u.user_id\n"
+            f"LEFT JOIN ({video_query}) AS v ON i.video_id = v.video_id")
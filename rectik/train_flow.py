@@ -113,6 +113,7 @@ class TrainingFlow(FlowSpec):
         """
         import os
 
+        import pandas as pd
         import nvtabular as nvt
         import merlin.models.tf as mm
         from merlin.io import Dataset
@@ -178,7 +179,11 @@ class TrainingFlow(FlowSpec):
         nvt_wkflow = nvt.Workflow(outputs)
         nvt_wkflow.fit(train_data)
 
-        video_features = Dataset(self.VIDEO_FEATURES_FILE)
+        # The feature file keeps the earlier rows of the videos that changed, embed the latest ones
+        video_features = pd.read_parquet(self.VIDEO_FEATURES_FILE)
+        # Deduplicated on the raw id, the encoded one depends on the fit that wrote the row
+        video_features = video_features.sort_values(["datetime", "created"]).drop_duplicates("video_id_raw", keep="last")
+        video_features = Dataset(video_features)
         video_embedding_workflow = nvt.Workflow(["video_id"] + ((['video_id'] + VIDEO_FEATURE_LIST) 
                                                 >> TransformWorkflow(nvt_wkflow.get_subworkflow("video")) 
                                                 >> PredictTensorflow(self.model_tt.first.item_block())))